@@ -1,17 +1,145 @@
 # backend/app/api/chat.py
 from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Optional, Dict, List
-from langchain.memory import ConversationBufferMemory
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
 import json
+import logging
+import os
+import time
 
-from app.services.llm_service import get_rag_chain, get_deep_research_chain
-from app.services.vector_service import resolve_path
+from app.services.answer_cache import ANSWER_CACHE_ENABLED, Scope, answer_cache
+from app.services.concurrency_service import OverloadedError, get_limiter, limiter_stats
+from app.services.llm_service import (
+    arun_deep_research,
+    arun_rag,
+    astream_deep_research,
+    astream_rag_answer,
+    condense_path,
+)
+from app.services.session_service import Turn, get_session_store, window_turns
+from app.services.singleflight_service import SINGLE_FLIGHT_ENABLED, FlightKey, flight_key, single_flight
+from app.services.vector_service import (
+    RETRIEVAL_MODE,
+    RETRIEVAL_MODES,
+    embed_query,
+    embed_query_batch,
+    get_index_version,
+    resolve_path,
+)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Simple in-memory session store (replace with DB/redis in production)
-session_memories: Dict[str, ConversationBufferMemory] = {}
+# Questions of one /chat/batch request answered at the same time (a request
+# may ask for fewer); each also takes a slot of its mode's limiter
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "500"))
+
+
+class ChatBatchRequest(BaseModel):
+    questions: List[str]
+    mode: str = "standard"
+    chroma_dir: Optional[str] = None
+    k: int = 5
+    retrieval: Optional[str] = None
+    concurrency: Optional[int] = None
+
+
+def _parse_history(chat_history: Optional[str]) -> List[Turn]:
+    """
+    Client-sent history (JSON list of {question, answer}) as turns.
+    """
+    if not chat_history:
+        return []
+    try:
+        parsed_history = json.loads(chat_history)
+        if not isinstance(parsed_history, list):
+            raise ValueError("chat_history must be a JSON list of {question, answer} objects")
+        return [
+            (item.get("question", ""), item.get("answer", "") or "")
+            for item in parsed_history
+            if item.get("question", "")
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid chat_history: {e}")
+
+
+async def _load_history(session_id: str, chat_history: Optional[str]) -> List[Turn]:
+    """
+    Session turns merged with whatever the client replayed (turns already
+    stored are not appended again), windowed to SESSION_HISTORY_TOKENS.
+    """
+    turns = await run_in_threadpool(get_session_store().load, session_id, _parse_history(chat_history))
+    return await run_in_threadpool(window_turns, turns)
+
+
+async def _remember(session_id: str, question: str, answer: str) -> None:
+    await run_in_threadpool(get_session_store().append, session_id, (question, answer))
+
+
+def _retrieval_mode(retrieval: Optional[str]) -> str:
+    retrieval = (retrieval or RETRIEVAL_MODE).lower()
+    if retrieval not in RETRIEVAL_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}"
+        )
+    return retrieval
+
+
+async def _lookup_answer(
+    query: str, mode: str, retrieval: str, k: int, store_path: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[Scope], Optional[List[float]]]:
+    """
+    Look the query up in the semantic answer cache.
+    Returns (cached payload or None, scope, query vector) so a miss can be
+    stored under the same scope once answered.
+    Lexical retrieval skips the cache: its point is to never embed the query.
+    """
+    if not ANSWER_CACHE_ENABLED or retrieval == "lexical":
+        return None, None, None
+    version = await run_in_threadpool(get_index_version, store_path)
+    vector = await run_in_threadpool(embed_query, query, store_path)
+    scope: Scope = (store_path, version, f"{mode}/{retrieval}", k)
+    hit = answer_cache.lookup(scope, vector)
+    if hit is None:
+        return None, scope, vector
+    payload, similarity = hit
+    payload["cache"] = {"hit": True, "similarity": round(similarity, 4)}
+    return payload, scope, vector
+
+
+def _cached_result(cached: Dict[str, Any], mode: str, path: str) -> Dict[str, Any]:
+    """
+    A cache hit with the same keys as a freshly computed answer of its mode.
+    """
+    cached.setdefault("context", None)
+    if mode == "deep":
+        cached["map_phase"] = None
+    else:
+        cached["condense"] = {"path": path}
+    cached["coalesced"] = False
+    return cached
+
+
+def _cache_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"answer": result["answer"], "sources": result["sources"], "context": result.get("context")}
+
+
+async def _flight_key(
+    query: str, history: List[Turn], path: str, mode: str, retrieval: str, k: int,
+    store_path: str, scope: Optional[Scope]
+) -> FlightKey:
+    """
+    Single-flight key for a request; history only counts when the question
+    gets condensed with it (otherwise the answer does not depend on it).
+    """
+    version = scope[1] if scope is not None else await run_in_threadpool(get_index_version, store_path)
+    return flight_key(store_path, version, mode, retrieval, k, query, history if path == "condensed" else [])
 
 
 @router.get("/chat")
@@ -21,63 +149,312 @@ async def chat_endpoint(
     mode: str = Query("standard", description="'standard' for RAG, 'deep' for research mode"),
     chroma_dir: Optional[str] = Query(None, description="Path to vector store directory"),
     k: int = Query(5, description="Number of documents to retrieve"),
-    chat_history: Optional[str] = Query(None, description="Frontend JSON string of chat history")
+    chat_history: Optional[str] = Query(None, description="Frontend JSON string of chat history"),
+    retrieval: Optional[str] = Query(None, description="'hybrid', 'vector' or 'lexical' (default: RETRIEVAL_MODE)")
 ):
     store_path = resolve_path(chroma_dir)
+    mode = mode.lower()
+    retrieval = _retrieval_mode(retrieval)
 
     try:
-        # --- Deep Research Mode ---
-        if mode.lower() == "deep":
-            deep_research_fn = get_deep_research_chain(k=k, store_path=store_path)
-            result = deep_research_fn(query)
-            return JSONResponse(content=result, status_code=200)
-
-        # --- Standard RAG Mode ---
-        if session_id not in session_memories:
-            session_memories[session_id] = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True,
-                output_key="answer"  # ✅ Fix: tell memory what to store
-            )
-
-        memory = session_memories[session_id]
-
-        # If front-end sent prior history, reconstruct it into the memory properly
-        if chat_history:
-            try:
-                parsed_history = json.loads(chat_history)
-                if not isinstance(parsed_history, list):
-                    raise ValueError("chat_history must be a JSON list of {question, answer} objects")
+        history = await _load_history(session_id, chat_history) if mode != "deep" else []
 
-                for item in parsed_history:
-                    q_text = item.get("question", "")
-                    a_text = item.get("answer", "")
-                    if q_text:
-                        memory.save_context({"question": q_text}, {"answer": a_text or ""})
+        # Answers that depend on earlier turns are never served from the cache
+        scope, vector = None, None
+        path = condense_path(query, history)
+        if path != "condensed":
+            cached, scope, vector = await _lookup_answer(query, mode, retrieval, k, store_path)
+            if cached is not None:
+                if mode != "deep":
+                    await _remember(session_id, query, cached["answer"])
+                return JSONResponse(content=_cached_result(cached, mode, path), status_code=200)
+
+        async def compute() -> Dict[str, Any]:
+            async with get_limiter(mode).slot():
+                # --- Deep Research Mode ---
+                if mode == "deep":
+                    return await arun_deep_research(query, k=k, store_path=store_path, retrieval=retrieval)
+                # --- Standard RAG Mode ---
+                return await arun_rag(query, history=history, k=k, store_path=store_path, retrieval=retrieval)
+
+        # Identical requests already being answered share that computation
+        shared = False
+        if SINGLE_FLIGHT_ENABLED:
+            key = await _flight_key(query, history, path, mode, retrieval, k, store_path, scope)
+            result, shared = await single_flight.do(key, compute)
+        else:
+            result = await compute()
+        if mode != "deep":
+            await _remember(session_id, query, result["answer"])
+
+        if scope is not None and vector is not None and not shared:
+            answer_cache.put(scope, vector, _cache_payload(result))
+        result["cache"] = {"hit": False}
+        result["coalesced"] = shared
+        return JSONResponse(content=result, status_code=200)
+
+    except OverloadedError as e:
+        raise _overloaded(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _overloaded(e: OverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def _sse(events: AsyncIterator[Dict[str, Any]], release) -> AsyncIterator[str]:
+    """
+    Encode events as Server-Sent Events; failures become an "error" event
+    because the 200 status has already been sent. The concurrency slot is
+    released when the stream ends or the client disconnects.
+    """
+    try:
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    finally:
+        release()
+
+
+async def _replay_cached(cached: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    if "condense" in cached:
+        yield {"event": "condense", "data": cached["condense"]}
+    yield {"event": "sources", "data": {"sources": cached["sources"]}}
+    if cached.get("context") is not None:
+        yield {"event": "context", "data": cached["context"]}
+    yield {"event": "cache", "data": cached["cache"]}
+    yield {"event": "token", "data": {"token": cached["answer"]}}
+    yield {"event": "done", "data": {"answer": cached["answer"]}}
 
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Invalid chat_history: {e}")
 
-        # Build and run chain
-        rag_chain = get_rag_chain(memory=memory, k=k, store_path=store_path)
-        result = rag_chain.invoke({"question": query})
+async def _cache_when_done(
+    events: AsyncIterator[Dict[str, Any]], scope: Scope, vector: List[float]
+) -> AsyncIterator[Dict[str, Any]]:
+    result: Dict[str, Any] = {"sources": [], "context": None}
+    async for event in events:
+        if event["event"] == "sources":
+            result["sources"] = event["data"]["sources"]
+        elif event["event"] == "context":
+            result["context"] = event["data"]
+        elif event["event"] == "done":
+            answer_cache.put(scope, vector, _cache_payload({**result, "answer": event["data"]["answer"]}))
+        yield event
 
-        # Extract answer and sources
-        answer_text = result.get("answer") or result.get("result", "")
 
-        sources: List[str] = []
-        for doc in result.get("source_documents", []):
-            src = doc.metadata.get("source", "unknown")
-            page = doc.metadata.get("page")
-            slide = doc.metadata.get("slide")
-            loc = f"Page {page}" if page else (f"Slide {slide}" if slide else "")
-            src_str = f"{src} {loc}".strip()
-            if src_str and src_str not in sources:
-                sources.append(src_str)
+async def _remember_when_done(
+    events: AsyncIterator[Dict[str, Any]], session_id: str, question: str
+) -> AsyncIterator[Dict[str, Any]]:
+    async for event in events:
+        if event["event"] == "done":
+            await _remember(session_id, question, event["data"]["answer"])
+        yield event
 
-        return JSONResponse(content={"answer": answer_text, "sources": sources}, status_code=200)
 
+@router.get("/chat/stream")
+async def chat_stream_endpoint(
+    session_id: str = Query(..., description="Unique session identifier"),
+    query: str = Query(..., description="User's input question"),
+    mode: str = Query("standard", description="'standard' for RAG, 'deep' for research mode"),
+    chroma_dir: Optional[str] = Query(None, description="Path to vector store directory"),
+    k: int = Query(5, description="Number of documents to retrieve"),
+    chat_history: Optional[str] = Query(None, description="Frontend JSON string of chat history"),
+    retrieval: Optional[str] = Query(None, description="'hybrid', 'vector' or 'lexical' (default: RETRIEVAL_MODE)")
+):
+    """
+    Same as /chat, but streams the answer as Server-Sent Events:
+    a "sources" event after retrieval, one "token" event per LLM token and
+    a final "done" event carrying the full answer.
+    """
+    store_path = resolve_path(chroma_dir)
+    mode = mode.lower()
+    retrieval = _retrieval_mode(retrieval)
+    limiter = get_limiter(mode)
+
+    try:
+        history = await _load_history(session_id, chat_history) if mode != "deep" else []
+        scope, vector = None, None
+        path = condense_path(query, history)
+        if path != "condensed":
+            cached, scope, vector = await _lookup_answer(query, mode, retrieval, k, store_path)
+            if cached is not None:
+                if mode != "deep":
+                    await _remember(session_id, query, cached["answer"])
+                return StreamingResponse(
+                    _sse(_replay_cached(_cached_result(cached, mode, path)), lambda: None),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+                )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    def produce() -> AsyncIterator[Dict[str, Any]]:
+        if mode == "deep":
+            events = astream_deep_research(query, k=k, store_path=store_path, retrieval=retrieval)
+        else:
+            events = astream_rag_answer(query, history=history, k=k, store_path=store_path, retrieval=retrieval)
+        if scope is not None and vector is not None:
+            events = _cache_when_done(events, scope, vector)
+        return events
+
+    # Identical streams already running are joined (replayed from their
+    # first event) without taking a slot; otherwise queue (or reject with
+    # 503) before the stream starts
+    try:
+        subscription = None
+        if SINGLE_FLIGHT_ENABLED:
+            key = await _flight_key(query, history, path, mode, retrieval, k, store_path, scope)
+            subscription = single_flight.join(key)
+        if subscription is None:
+            await limiter.acquire()
+            if SINGLE_FLIGHT_ENABLED:
+                # The slot is held until the shared producer finishes
+                subscription = single_flight.start(key, produce, on_done=limiter.release)
+    except OverloadedError as e:
+        raise _overloaded(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if subscription is not None:
+        events, release = subscription, subscription.close
+    else:
+        events = produce()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                limiter.release()
+
+    if mode != "deep":
+        events = _remember_when_done(events, session_id, query)
+
+    # The background task covers a client that disconnects before the
+    # stream is ever iterated
+    return StreamingResponse(
+        _sse(events, release),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
+
+@router.post("/chat/batch")
+async def chat_batch_endpoint(body: ChatBatchRequest):
+    """
+    Answer many independent questions (no session history), streamed as
+    NDJSON in completion order: one {"index", "question", "answer",
+    "sources", ...} or {"index", "question", "error", "status"} line per
+    question, then a {"done": true, ...} summary line.
+    All questions are embedded in one pass up front; answers go through
+    (and fill) the semantic answer cache like /chat.
+    """
+    if not body.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(body.questions) > CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {CHAT_BATCH_MAX_QUESTIONS} questions per batch")
+    store_path = resolve_path(body.chroma_dir)
+    mode = body.mode.lower()
+    retrieval = _retrieval_mode(body.retrieval)
+    k = body.k
+    semaphore = asyncio.Semaphore(max(1, min(body.concurrency or CHAT_BATCH_CONCURRENCY, CHAT_BATCH_CONCURRENCY)))
+
+    async def answer(index: int, question: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                cached, scope, vector = await _lookup_answer(question, mode, retrieval, k, store_path)
+                if cached is not None:
+                    return {"index": index, "question": question, **_cached_result(cached, mode, "no_history")}
+                async with get_limiter(mode).slot():
+                    if mode == "deep":
+                        result = await arun_deep_research(question, k=k, store_path=store_path, retrieval=retrieval)
+                    else:
+                        result = await arun_rag(question, history=[], k=k, store_path=store_path, retrieval=retrieval)
+                if scope is not None and vector is not None:
+                    answer_cache.put(scope, vector, _cache_payload(result))
+                result["cache"] = {"hit": False}
+                result["coalesced"] = False
+                return {"index": index, "question": question, **result}
+            except OverloadedError as e:
+                return {"index": index, "question": question, "error": str(e), "status": 503}
+            except Exception as e:
+                return {"index": index, "question": question, "error": str(e), "status": 500}
+
+    async def lines() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        counts = {"answered": 0, "failed": 0, "cache_hits": 0}
+        if retrieval != "lexical":
+            # Fills the query memo that the cache lookup and retrieval read
+            try:
+                await run_in_threadpool(embed_query_batch, list(dict.fromkeys(body.questions)), store_path)
+            except Exception as e:
+                logger.warning("Batch query embedding failed, embedding per question: %s", e)
+        tasks = [asyncio.create_task(answer(i, q)) for i, q in enumerate(body.questions)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                row = await next_done
+                if "error" in row:
+                    counts["failed"] += 1
+                else:
+                    counts["answered"] += 1
+                    counts["cache_hits"] += bool(row.get("cache", {}).get("hit"))
+                yield json.dumps(row) + "\n"
+            yield json.dumps({
+                "done": True,
+                "questions": len(tasks),
+                **counts,
+                "seconds": round(time.perf_counter() - started, 3),
+            }) + "\n"
+        finally:
+            # Client went away: stop answering
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/chat/cache")
+async def chat_cache_stats():
+    """
+    Semantic answer cache size and hit rate.
+    """
+    return JSONResponse(content=answer_cache.stats(), status_code=200)
+
+
+@router.get("/chat/limits")
+async def chat_limits():
+    """
+    Current per-mode concurrency: active, queued and rejected requests.
+    """
+    return JSONResponse(content=limiter_stats(), status_code=200)
+
+
+@router.get("/chat/sessions")
+async def chat_sessions():
+    """
+    Session store backend and number of live sessions.
+    """
+    stats = await run_in_threadpool(get_session_store().stats)
+    return JSONResponse(content=stats, status_code=200)
+
+
+@router.get("/chat/inflight")
+async def chat_inflight():
+    """
+    Single-flight counters: requests that led a computation, requests
+    coalesced onto one already running, and shared computations cancelled
+    because every caller disconnected.
+    """
+    return JSONResponse(content=single_flight.stats(), status_code=200)
@@ -0,0 +1,80 @@
+# backend/app/api/retrieve.py
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Dict, List, Optional
+import json
+import os
+import time
+
+from app.services.llm_service import format_sources
+from app.services.metrics_service import timed
+from app.services.vector_service import RETRIEVAL_MODE, RETRIEVAL_MODES, resolve_path, retrieve_batch
+
+router = APIRouter()
+
+# Queries embedded and searched together per pass; each pass is streamed
+# back as soon as it is done
+RETRIEVE_BATCH_SIZE = int(os.getenv("RETRIEVE_BATCH_SIZE", "32"))
+RETRIEVE_BATCH_MAX_QUERIES = int(os.getenv("RETRIEVE_BATCH_MAX_QUERIES", "1000"))
+
+
+class RetrieveBatchRequest(BaseModel):
+    queries: List[str]
+    k: int = 5
+    chroma_dir: Optional[str] = None
+    retrieval: Optional[str] = None
+
+
+def _document(doc) -> Dict[str, Any]:
+    return {"id": doc.id, "content": doc.page_content, "metadata": doc.metadata}
+
+
+@router.post("/retrieve/batch")
+async def retrieve_batch_endpoint(body: RetrieveBatchRequest):
+    """
+    Top-k documents for many queries, streamed as NDJSON: one line per
+    query ({"index", "query", "sources", "documents"} or {"index", "query",
+    "error"}) in input order, then a {"done": true, ...} summary line.
+    """
+    if not body.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(body.queries) > RETRIEVE_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {RETRIEVE_BATCH_MAX_QUERIES} queries per batch")
+    retrieval = (body.retrieval or RETRIEVAL_MODE).lower()
+    if retrieval not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}")
+    store_path = resolve_path(body.chroma_dir)
+    queries, k = body.queries, body.k
+
+    def search(part: List[str]):
+        with timed("retrieve_batch"):
+            return retrieve_batch(part, k=k, store_path=store_path, mode=retrieval)
+
+    async def lines() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        failed = 0
+        size = max(RETRIEVE_BATCH_SIZE, 1)
+        for start in range(0, len(queries), size):
+            part = queries[start:start + size]
+            try:
+                hits = await run_in_threadpool(search, part)
+                rows = [
+                    {"index": start + i, "query": q, "sources": format_sources(docs),
+                     "documents": [_document(d) for d in docs]}
+                    for i, (q, docs) in enumerate(zip(part, hits))
+                ]
+            except Exception as e:
+                failed += len(part)
+                rows = [{"index": start + i, "query": q, "error": str(e)} for i, q in enumerate(part)]
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+        yield json.dumps({
+            "done": True,
+            "queries": len(queries),
+            "failed": failed,
+            "retrieval": retrieval,
+            "seconds": round(time.perf_counter() - started, 3),
+        }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,40 @@
+# backend/app/api/sources.py
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from app.services.ingest_service import delete_source, list_sources
+from app.services.vector_service import resolve_path
+
+router = APIRouter()
+
+
+@router.get("/sources")
+async def get_sources(
+    chroma_dir: Optional[str] = Query(None, description="Path to vector store directory")
+):
+    store_path = resolve_path(chroma_dir)
+    return JSONResponse(
+        content={"chroma_dir_used": store_path, "sources": await run_in_threadpool(list_sources, store_path)},
+        status_code=200
+    )
+
+
+@router.delete("/sources/{source}")
+async def remove_source(
+    source: str,
+    chroma_dir: Optional[str] = Query(None, description="Path to vector store directory")
+):
+    store_path = resolve_path(chroma_dir)
+    try:
+        # Deletes from the vector store and BM25 index, then persists both
+        removed = await run_in_threadpool(delete_source, source, store_path=store_path)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Source '{source}' is not indexed")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(
+        content={"source": source, "chunks_deleted": removed, "chroma_dir_used": store_path},
+        status_code=200
+    )
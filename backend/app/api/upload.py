@@ -1,12 +1,14 @@
 # backend/app/api/upload.py
-from fastapi import APIRouter, File, UploadFile, Form
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from pathlib import Path
+import asyncio
 import shutil
 
-from app.services.document_service import load_documents
-from app.services.vector_service import add_documents, resolve_path, reset_vector_store
+from app.services.job_service import create_job, get_job, list_jobs, start_job
+from app.services.vector_service import resolve_path
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent  # backend/
 UPLOAD_DIR = BASE_DIR / "uploaded_files"
@@ -14,10 +16,18 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 router = APIRouter()
 
+
+def _save_upload(file: UploadFile, file_path: Path) -> None:
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+
 @router.post("/upload")
 async def upload_files(
     files: List[UploadFile] = File(...),
-    chroma_dir: Optional[str] = Form(None)
+    chroma_dir: Optional[str] = Form(None),
+    mode: str = Form("replace", description="'replace' rebuilds the store, 'incremental' upserts changed files only"),
+    wait: bool = Form(False, description="Block until the ingestion job finishes")
 ):
     if not files:
         return JSONResponse(
@@ -25,48 +35,77 @@ async def upload_files(
             status_code=400
         )
 
-    store_path = resolve_path(chroma_dir)
+    mode = mode.lower()
+    if mode not in ("replace", "incremental"):
+        return JSONResponse(
+            content={"error": "mode must be 'replace' or 'incremental'."},
+            status_code=400
+        )
+
+    # Files are indexed under their base name, so two with the same name
+    # would overwrite each other
+    names = [Path(file.filename).name for file in files if file.filename]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        return JSONResponse(
+            content={"error": f"Duplicate file names in one upload: {', '.join(duplicates)}"},
+            status_code=400
+        )
 
-    # Reset once for the whole batch
-    reset_vector_store(store_path)
+    store_path = resolve_path(chroma_dir)
+    job = create_job(store_path, mode)
 
-    saved_files: List[str] = []
-    extracted_count = 0
-    failed: List[str] = []
+    # Each job gets its own directory so concurrent uploads of the same
+    # filename do not overwrite each other before they are parsed
+    job_dir = UPLOAD_DIR / job.id
+    await run_in_threadpool(job_dir.mkdir, parents=True, exist_ok=True)
 
+    saved_paths: List[str] = []
     for file in files:
         if not file.filename:
-            failed.append("(unnamed file)")
+            job.errors.append("(unnamed file)")
             continue
 
-        file_path = UPLOAD_DIR / file.filename
+        file_path = job_dir / Path(file.filename).name
 
         # Save uploaded file
         try:
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
-            saved_files.append(file.filename)
+            await run_in_threadpool(_save_upload, file, file_path)
+            saved_paths.append(str(file_path))
         except Exception as e:
-            failed.append(f"{file.filename} (save error: {e})")
-            continue
+            job.errors.append(f"{file.filename} (save error: {e})")
 
-        # Extract text and add to vector DB
-        try:
-            docs = load_documents(str(file_path))
-            if docs:
-                extracted_count += len(docs)
-                add_documents(docs, store_path=store_path, reset=False)
-        except Exception as e:
-            failed.append(f"{file.filename} (process error: {e})")
+    # Extraction, embedding and persisting run in the background job, which
+    # removes job_dir when it is done
+    start_job(job, saved_paths, upload_dir=str(job_dir))
+
+    if wait and job.task is not None:
+        await asyncio.shield(job.task)
+        status = 200 if job.status == "completed" else 500
+        return JSONResponse(content=job.to_dict(), status_code=status)
 
-    status = 200 if extracted_count > 0 else 500
     return JSONResponse(
         content={
-            "message": "Ingestion completed",
-            "files_saved": saved_files,
-            "documents_indexed": extracted_count,
-            "failed": failed,
-            "chroma_dir_used": store_path
+            "message": "Ingestion job queued",
+            "job_id": job.id,
+            "status_url": f"/api/upload/jobs/{job.id}",
+            "files_saved": [Path(p).name for p in saved_paths],
+            "failed": job.errors,
+            "chroma_dir_used": store_path,
+            "mode": mode
         },
-        status_code=status
+        status_code=202
     )
+
+
+@router.get("/upload/jobs")
+async def get_upload_jobs():
+    return JSONResponse(content={"jobs": list_jobs()}, status_code=200)
+
+
+@router.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return JSONResponse(content=job.to_dict(), status_code=200)
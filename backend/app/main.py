@@ -1,28 +1,79 @@
 # backend/app/main.py
-from fastapi import FastAPI
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import upload, chat
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.services.metrics_service import (
+    METRICS_SERVER_TIMING,
+    counter,
+    histogram,
+    render_prometheus,
+    request_timings,
+    server_timing_header,
+)
+from app.services.startup_service import load_routers, start_background_boot, state
 from pathlib import Path
 import os
 
 from dotenv import load_dotenv   
 load_dotenv()
 
+# Application logs (startup, model loads, fallbacks) go to stderr
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+# The HTTP client logs every LLM request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
 # --- Ensure vector store directory exists ---
 BASE_DIR = Path(__file__).resolve().parent.parent  # points to backend/
 CHROMA_DIR = BASE_DIR / "chroma_store"
 CHROMA_DIR.mkdir(parents=True , exist_ok=True)  # creates if not exists
 
-# Debug prints to confirm paths
-print("Backend base directory:", BASE_DIR)
-print("Chroma vector store path:", CHROMA_DIR)
-print("Is 'chroma_store' writable?", os.access(CHROMA_DIR, os.W_OK))
+# Log the paths in use
+logger.info("Backend base directory: %s", BASE_DIR)
+logger.info("Chroma vector store path: %s", CHROMA_DIR)
+logger.info("Is 'chroma_store' writable? %s", os.access(CHROMA_DIR, os.W_OK))
+
+# Load the embedding model at startup instead of on the first request
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() in ("1", "true", "yes")
+# Seconds clients are told to wait while the API is still booting
+STARTUP_RETRY_AFTER = os.getenv("STARTUP_RETRY_AFTER", "2")
+
+API_PREFIX = "/api"
+
+HTTP_REQUESTS = counter("rag_http_requests_total", "HTTP requests served", ("method", "route", "status"))
+HTTP_SECONDS = histogram("rag_http_request_seconds", "Time to response headers", ("method", "route"))
+
+
+def include_api_router(router, tag: str) -> None:
+    app.include_router(router, prefix=API_PREFIX, tags=[tag])
+    app.openapi_schema = None  # regenerate /docs with the new routes
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Routers (LangChain, transformers, Chroma) and the embedding model load
+    # in the background so the process answers /healthz and /readyz at once
+    start_background_boot(include_api_router, warm_embeddings=EMBEDDING_WARMUP)
+    yield
+    if "app.services.document_service" in sys.modules:
+        from app.services.document_service import shutdown_extraction_pool
+        shutdown_extraction_pool()
+
 
 # --- Initialize FastAPI app ---
 app = FastAPI(
     title="RAG Chat Backend",
     description="Backend API for Retrieval-Augmented Generation chat system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- CORS middleware for frontend (Streamlit) ---
@@ -34,11 +85,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Include API routers ---
-app.include_router(upload.router, prefix="/api", tags=["Document Upload"])
-app.include_router(chat.router, prefix="/api", tags=["Chat"])
+
+# --- API routes are mounted by the startup thread; hold requests until then ---
+@app.middleware("http")
+async def wait_for_routes(request: Request, call_next):
+    if request.url.path.startswith(API_PREFIX) and not state.routes_ready:
+        if state._thread is None:
+            # Lifespan never ran (e.g. a test client): load the routes inline
+            await run_in_threadpool(load_routers, include_api_router)
+        else:
+            return JSONResponse(
+                content={"detail": "Service is starting", **state.to_dict()},
+                status_code=503,
+                headers={"Retry-After": STARTUP_RETRY_AFTER},
+            )
+    return await call_next(request)
+
+
+# --- Request metrics and the per-stage Server-Timing breakdown ---
+# (registered last so it wraps everything else; streamed responses report
+# the stages finished before their headers went out)
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    started = time.perf_counter()
+    with request_timings() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    # Label by route template, not raw path, to keep the series count bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    if request.url.path.startswith(API_PREFIX) and route != "unmatched":
+        route = API_PREFIX + route  # included routes keep their unprefixed path
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=str(response.status_code))
+    HTTP_SECONDS.observe(elapsed, method=request.method, route=route)
+    if METRICS_SERVER_TIMING and timings:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
 
 # --- Root endpoint for health check ---
 @app.get("/")
 async def root():
     return {"message": "RAG Chat Backend is running"}
+
+
+# --- Liveness: the process is up and serving (boot may still be running) ---
+@app.get("/healthz")
+async def healthz():
+    status_code = 500 if state.phase == "failed" else 200
+    return JSONResponse(content={"status": state.phase, "error": state.error}, status_code=status_code)
+
+
+# --- Readiness: routes loaded, embedding model and default store warm ---
+@app.get("/readyz")
+async def readyz():
+    return JSONResponse(content=state.to_dict(), status_code=200 if state.ready else 503)
+
+
+# --- Prometheus scrape endpoint: stage histograms, counters, cache stats ---
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# --- Embedding model registry stats (load time, memory footprint) ---
+@app.get("/models")
+async def models():
+    from app.services.embedding_service import get_model_stats
+    return {"embedding_models": get_model_stats()}
+
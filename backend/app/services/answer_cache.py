@@ -0,0 +1,108 @@
+# backend/app/services/answer_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.metrics_service import register_stats
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "true").lower() in ("1", "true", "yes")
+# Minimum cosine similarity between query embeddings for a cache hit
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# Seconds an answer stays valid
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# (store path, index version, mode, k): answers never cross these boundaries
+Scope = Tuple[str, str, str, int]
+
+
+class AnswerCache:
+    """
+    Answers looked up by query-embedding similarity within a scope.
+    Entries expire after ttl seconds; the least recently used entry is
+    evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._next_id = 0
+        # id -> (scope, normalised vector, payload, created_at)
+        self._entries: "OrderedDict[int, Tuple[Scope, np.ndarray, Dict[str, Any], float]]" = OrderedDict()
+        self._by_scope: Dict[Scope, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, entry_id: int) -> None:
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._by_scope.get(scope, [])
+        if entry_id in ids:
+            ids.remove(entry_id)
+        if not ids:
+            self._by_scope.pop(scope, None)
+
+    @staticmethod
+    def _normalise(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def lookup(self, scope: Scope, vector: List[float]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Best cached payload for the scope with similarity >= threshold.
+        """
+        query = self._normalise(vector)
+        now = time.time()
+        with self._lock:
+            ids = [i for i in self._by_scope.get(scope, []) if now - self._entries[i][3] <= self.ttl]
+            for expired in set(self._by_scope.get(scope, [])) - set(ids):
+                self._remove(expired)
+
+            if ids:
+                matrix = np.stack([self._entries[i][1] for i in ids])
+                sims = matrix @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry_id = ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return dict(self._entries[entry_id][2]), float(sims[best])
+
+            self.misses += 1
+            return None
+
+    def put(self, scope: Scope, vector: List[float], payload: Dict[str, Any]) -> None:
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, self._normalise(vector), dict(payload), time.time())
+            self._by_scope.setdefault(scope, []).append(entry_id)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD)
+register_stats("rag_answer_cache", answer_cache.stats, counters=("hits", "misses", "evictions"))
@@ -0,0 +1,151 @@
+# backend/app/services/chunking_service.py
+import os
+import re
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from langchain.schema import Document
+
+from app.services.embedding_service import get_embeddings_model
+
+# bge-base truncates at 512 tokens (incl. [CLS]/[SEP]); stay under it
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "384"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "48"))
+
+# Long texts are tokenized in slices of this many characters so a single
+# huge TXT/CSV document never has to be tokenized in one go
+_SEGMENT_CHARS = 50_000
+
+T = TypeVar("T")
+
+
+def get_tokenizer() -> Any:
+    """
+    Return the embedding model's tokenizer, or None if it is not available.
+    """
+    client = getattr(get_embeddings_model(), "client", None)
+    return getattr(client, "tokenizer", None)
+
+
+def _token_spans(text: str, tokenizer: Any) -> List[Tuple[int, int]]:
+    """
+    Character (start, end) span of every token in text.
+    Falls back to whitespace-delimited words when no fast tokenizer is available.
+    """
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        encoded = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return [(int(s), int(e)) for s, e in encoded["offset_mapping"] if e > s]
+    return [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+
+
+def count_tokens(text: str, tokenizer: Any = None) -> int:
+    """
+    Number of embedding-model tokens in text.
+    """
+    if tokenizer is None:
+        tokenizer = get_tokenizer()
+    return len(_token_spans(text, tokenizer))
+
+
+def truncate_tokens(text: str, max_tokens: int, tokenizer: Any = None) -> str:
+    """
+    The longest prefix of text with at most max_tokens tokens.
+    """
+    if tokenizer is None:
+        tokenizer = get_tokenizer()
+    spans = _token_spans(text, tokenizer)
+    if len(spans) <= max_tokens:
+        return text
+    return text[:spans[max_tokens - 1][1]] if max_tokens > 0 else ""
+
+
+def _segment_end(text: str, start: int) -> int:
+    end = min(len(text), start + _SEGMENT_CHARS)
+    if end < len(text):
+        # Avoid cutting a word in half at the segment boundary
+        ws = max(text.rfind(c, start, end) for c in (" ", "\n", "\t"))
+        if ws > start:
+            end = ws
+    return end
+
+
+def _iter_windows(
+    text: str, tokenizer: Any, chunk_size: int, chunk_overlap: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) character offsets of token windows over text.
+    """
+    step = max(chunk_size - chunk_overlap, 1)
+    pos = 0
+    while pos < len(text):
+        seg_end = _segment_end(text, pos)
+        last_segment = seg_end >= len(text)
+        spans = _token_spans(text[pos:seg_end], tokenizer)
+        if not spans:
+            pos = seg_end
+            continue
+
+        i = 0
+        emitted = False
+        while i < len(spans):
+            window_end = min(i + chunk_size, len(spans))
+            if window_end == len(spans) and not last_segment and emitted:
+                # Incomplete tail: re-tokenize it together with the next segment
+                break
+            yield pos + spans[i][0], pos + spans[window_end - 1][1]
+            emitted = True
+            if window_end == len(spans):
+                i = len(spans)
+                break
+            i += step
+
+        if last_segment:
+            break
+        pos = pos + spans[i][0] if i < len(spans) else seg_end
+
+
+def iter_chunks(
+    docs: Iterable[Document],
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    tokenizer: Any = None,
+) -> Iterator[Document]:
+    """
+    Lazily split documents into token-bounded chunks.
+    Each chunk keeps its parent's metadata (source/page/slide/...) plus
+    start_index/end_index character offsets into the parent text and a
+    per-document chunk number.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunk_overlap = CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    if tokenizer is None:
+        tokenizer = get_tokenizer()
+
+    for doc in docs:
+        text = doc.page_content
+        for n, (start, end) in enumerate(_iter_windows(text, tokenizer, chunk_size, chunk_overlap)):
+            chunk_text = text[start:end]
+            if not chunk_text.strip():
+                continue
+            metadata = dict(doc.metadata)
+            metadata.update({"start_index": start, "end_index": end, "chunk": n})
+            yield Document(page_content=chunk_text, metadata=metadata)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Group an iterable into lists of at most size items without materialising it.
+    """
+    it = iter(items)
+    while True:
+        batch = list(islice(it, max(size, 1)))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,101 @@
+# backend/app/services/concurrency_service.py
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from app.services.metrics_service import register_stats
+
+# How long a queued request waits for a slot before giving up (seconds)
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+# Retry-After hint sent with 503 responses (seconds)
+CHAT_RETRY_AFTER = int(os.getenv("CHAT_RETRY_AFTER", "5"))
+
+
+class OverloadedError(Exception):
+    """
+    Raised when a request cannot be queued or waited too long for a slot.
+    """
+
+    def __init__(self, message: str, retry_after: int = CHAT_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ModeLimiter:
+    """
+    Caps concurrent requests of one chat mode and bounds how many may wait.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def acquire(self) -> None:
+        # Count in-flight acquisitions ourselves: the semaphore only looks
+        # "locked" once an acquire has actually completed
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(f"Too many '{self.name}' requests queued; retry later")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=CHAT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise OverloadedError(f"Timed out waiting for a '{self.name}' slot; retry later")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+# Deep research fans out into many LLM calls, so it gets far fewer slots
+_limiters: Dict[str, ModeLimiter] = {
+    "standard": ModeLimiter(
+        "standard",
+        int(os.getenv("CHAT_MAX_CONCURRENCY_STANDARD", "8")),
+        int(os.getenv("CHAT_MAX_QUEUE_STANDARD", "32")),
+    ),
+    "deep": ModeLimiter(
+        "deep",
+        int(os.getenv("CHAT_MAX_CONCURRENCY_DEEP", "2")),
+        int(os.getenv("CHAT_MAX_QUEUE_DEEP", "4")),
+    ),
+}
+
+
+def get_limiter(mode: str) -> ModeLimiter:
+    return _limiters["deep" if mode == "deep" else "standard"]
+
+
+def limiter_stats() -> Dict[str, Dict[str, int]]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+register_stats("rag_chat_limiter", limiter_stats, counters=("rejected",), label="mode")
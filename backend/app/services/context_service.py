@@ -0,0 +1,98 @@
+# backend/app/services/context_service.py
+import os
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+from app.services.chunking_service import count_tokens, get_tokenizer, truncate_tokens
+from app.services.metrics_service import counter
+
+# Token budget for the retrieved passages stuffed into the answer prompt,
+# counted with the embedding model's tokenizer; 0 disables trimming
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Share of a passage's word shingles already in the packed context above
+# which it is dropped as a near-duplicate
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.9"))
+# A passage that overflows the budget is cut to the room left, unless that
+# is fewer tokens than this (then it is skipped)
+CONTEXT_MIN_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MIN_PASSAGE_TOKENS", "64"))
+
+_SHINGLE_WORDS = 3
+_WORD_RE = re.compile(r"\w+")
+
+CONTEXT_TOKENS = counter(
+    "rag_context_tokens_total", "Tokens of retrieved context, before and after packing", ("kind",)
+)
+CONTEXT_DROPPED = counter(
+    "rag_context_passages_dropped_total", "Retrieved passages left out of the prompt", ("reason",)
+)
+
+
+def shingles(text: str) -> Set[Tuple[str, ...]]:
+    """
+    Case-folded word n-grams of text (a single shorter gram for tiny texts).
+    """
+    words = _WORD_RE.findall(text.casefold())
+    if len(words) <= _SHINGLE_WORDS:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)}
+
+
+def pack_context(
+    docs: List[Document],
+    budget: Optional[int] = None,
+    tokenizer: Any = None
+) -> Tuple[List[Document], Dict[str, Any]]:
+    """
+    Select the retrieved passages that go into the prompt. Passages keep
+    their retrieval (relevance) order; one whose text is mostly already in
+    the packed context (overlapping chunks, the same page indexed twice) is
+    dropped, and passages are added until budget tokens are used, cutting
+    the one that overflows when enough room is left for it.
+    Returns (packed passages, stats with token counts).
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    if tokenizer is None:
+        tokenizer = get_tokenizer()
+
+    packed: List[Document] = []
+    seen: Set[Tuple[str, ...]] = set()
+    used = retrieved_tokens = duplicates = over_budget = truncated = 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content, tokenizer)
+        retrieved_tokens += tokens
+        grams = shingles(doc.page_content)
+        if not grams or len(grams & seen) >= CONTEXT_DEDUP_THRESHOLD * len(grams):
+            duplicates += 1
+            continue
+
+        if budget > 0 and used + tokens > budget:
+            room = budget - used
+            # The best passage is always sent, cut to the budget if need be
+            if room < CONTEXT_MIN_PASSAGE_TOKENS and packed:
+                over_budget += 1
+                continue
+            doc = Document(page_content=truncate_tokens(doc.page_content, room, tokenizer), metadata=doc.metadata)
+            tokens = count_tokens(doc.page_content, tokenizer)
+            grams = shingles(doc.page_content)
+            truncated += 1
+
+        packed.append(doc)
+        seen |= grams
+        used += tokens
+
+    CONTEXT_TOKENS.inc(retrieved_tokens, kind="retrieved")
+    CONTEXT_TOKENS.inc(used, kind="packed")
+    CONTEXT_DROPPED.inc(duplicates, reason="duplicate")
+    CONTEXT_DROPPED.inc(over_budget, reason="over_budget")
+    return packed, {
+        "retrieved": len(docs),
+        "packed": len(packed),
+        "duplicates": duplicates,
+        "over_budget": over_budget,
+        "truncated": truncated,
+        "retrieved_tokens": retrieved_tokens,
+        "tokens": used,
+        "budget": budget,
+    }
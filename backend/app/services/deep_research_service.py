@@ -0,0 +1,229 @@
+# backend/app/services/deep_research_service.py
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from app.services.chunking_service import count_tokens
+from app.services.metrics_service import record_llm_usage, register_stats, timed
+
+# Concurrent map-phase LLM calls per deep-research request
+DEEP_RESEARCH_FANOUT = int(os.getenv("DEEP_RESEARCH_FANOUT", "4"))
+# Small documents are packed into one map call up to this many tokens
+DEEP_RESEARCH_PACK_TOKENS = int(os.getenv("DEEP_RESEARCH_PACK_TOKENS", "3000"))
+# Summaries kept in the in-process cache (LRU)
+DEEP_RESEARCH_CACHE_SIZE = int(os.getenv("DEEP_RESEARCH_CACHE_SIZE", "2048"))
+
+# Same prompt load_summarize_chain(chain_type="map_reduce") uses
+SUMMARY_PROMPT = """Write a concise summary of the following:
+
+
+"{text}"
+
+
+CONCISE SUMMARY:"""
+
+# Several small documents in one map call, still summarised one by one so
+# each summary can be cached under its own document
+PACKED_SUMMARY_PROMPT = """Write a concise summary of each of the following numbered texts.
+Reply with one summary per text, in order, each starting with the text's
+number in square brackets, e.g. "[1] ...".
+
+
+{text}
+
+
+CONCISE SUMMARIES:"""
+
+_NUMBERED_RE = re.compile(r"^\s*\[(\d+)\]\s*", re.MULTILINE)
+
+
+class SummaryCache:
+    """
+    LRU cache of summaries keyed by a hash of (model, prompt, input text):
+    one entry per document for the map phase, per combined text for the
+    reduce steps.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+summary_cache = SummaryCache(DEEP_RESEARCH_CACHE_SIZE)
+register_stats("rag_summary_cache", summary_cache.stats, counters=("hits", "misses"))
+
+
+def _summary_key(llm: Any, text: str) -> str:
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return hashlib.sha256(f"{model}\x00{SUMMARY_PROMPT}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def pack_texts(texts: List[str], budget: int) -> List[List[str]]:
+    """
+    Greedily group consecutive texts so each group stays within budget tokens.
+    A text larger than the budget gets a group of its own.
+    """
+    packs: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and used + tokens > budget:
+            packs.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def split_numbered(reply: str, count: int) -> Optional[List[str]]:
+    """
+    The "[n] ..." entries of a PACKED_SUMMARY_PROMPT reply, or None unless
+    there is exactly one non-empty entry for each of the count texts.
+    """
+    parts = _NUMBERED_RE.split(reply)
+    entries = {int(number): body.strip() for number, body in zip(parts[1::2], parts[2::2])}
+    if sorted(entries) != list(range(1, count + 1)) or not all(entries.values()):
+        return None
+    return [entries[n] for n in range(1, count + 1)]
+
+
+async def _ainvoke_map(llm: Any, prompt: str, semaphore: asyncio.Semaphore, stats: Dict[str, int]) -> str:
+    async with semaphore:
+        with timed("llm_map"):
+            result = await llm.ainvoke(prompt)
+    record_llm_usage("map", getattr(result, "usage_metadata", None))
+    stats["llm_calls"] += 1
+    return getattr(result, "content", str(result)).strip()
+
+
+async def _summarize_pack(
+    llm: Any, pack: List[str], semaphore: asyncio.Semaphore, stats: Dict[str, int]
+) -> List[str]:
+    """
+    Summaries of the documents of one map call, each cached under its own
+    text. A reply that does not keep one entry per document is used as a
+    single summary of the pack and not cached.
+    """
+    if len(pack) == 1:
+        summaries = [await _ainvoke_map(llm, SUMMARY_PROMPT.format(text=pack[0]), semaphore, stats)]
+    else:
+        numbered = "\n\n".join(f"[{n}] {text}" for n, text in enumerate(pack, start=1))
+        reply = await _ainvoke_map(llm, PACKED_SUMMARY_PROMPT.format(text=numbered), semaphore, stats)
+        split = split_numbered(reply, len(pack))
+        if split is None:
+            return [reply]
+        summaries = split
+    for text, summary in zip(pack, summaries):
+        summary_cache.put(_summary_key(llm, text), summary)
+    return summaries
+
+
+async def _summarize(llm: Any, text: str, semaphore: asyncio.Semaphore, stats: Dict[str, int]) -> str:
+    """
+    One reduce step: summarise already summarised text (cached by that text).
+    """
+    key = _summary_key(llm, text)
+    summary = summary_cache.get(key)
+    if summary is None:
+        summary = await _ainvoke_map(llm, SUMMARY_PROMPT.format(text=text), semaphore, stats)
+        summary_cache.put(key, summary)
+    return summary
+
+
+def _collapse_groups(summaries: List[str]) -> Optional[List[List[str]]]:
+    """
+    Groups of summaries to collapse before combining, or None when they
+    already fit one call (or packing would not shrink them).
+    """
+    if count_tokens("\n\n".join(summaries)) <= DEEP_RESEARCH_PACK_TOKENS:
+        return None
+    groups = pack_texts(summaries, DEEP_RESEARCH_PACK_TOKENS)
+    return None if len(groups) == len(summaries) else groups
+
+
+async def asummarize_documents(llm: Any, docs: List[Document]) -> Tuple[str, Dict[str, int]]:
+    """
+    Map-reduce summary of docs.
+    - Each document's summary is cached by its content hash, so a repeat
+      question reuses it whatever the retrieval order or the other documents.
+    - The rest are packed up to DEEP_RESEARCH_PACK_TOKENS per call (still
+      summarised one by one) and run concurrently, at most
+      DEEP_RESEARCH_FANOUT at a time.
+    - Summaries are collapsed the same way until they fit one call, then combined.
+    Returns the summary and counters for the map phase.
+    """
+    stats = {"documents": len(docs), "map_calls": 0, "cached": 0, "llm_calls": 0}
+    if not docs:
+        return "", stats
+
+    semaphore = asyncio.Semaphore(max(DEEP_RESEARCH_FANOUT, 1))
+    # Identical chunks (e.g. the same page indexed twice) are summarised once
+    texts = list(dict.fromkeys(doc.page_content for doc in docs))
+    summaries: List[Optional[str]] = [summary_cache.get(_summary_key(llm, t)) for t in texts]
+    stats["cached"] = sum(1 for s in summaries if s is not None)
+    pending = [i for i, s in enumerate(summaries) if s is None]
+
+    # Token counting may load the tokenizer: keep it off the event loop
+    packs = await asyncio.to_thread(pack_texts, [texts[i] for i in pending], DEEP_RESEARCH_PACK_TOKENS)
+    stats["map_calls"] = len(packs)
+    mapped = await asyncio.gather(*(_summarize_pack(llm, pack, semaphore, stats) for pack in packs))
+    # Fresh summaries go back to their documents' places so the combine
+    # prompt keeps retrieval order whatever was cached; a pack summarised
+    # as a whole takes the place of its first document
+    positions = iter(pending)
+    for pack, pack_summaries in zip(packs, mapped):
+        indices = [next(positions) for _ in pack]
+        for i, summary in zip(indices, pack_summaries):
+            summaries[i] = summary
+    partial = [s for s in summaries if s is not None]
+
+    # Collapse until the summaries fit in a single combine call
+    while len(partial) > 1:
+        groups = await asyncio.to_thread(_collapse_groups, partial)
+        if groups is None:
+            break
+        partial = list(await asyncio.gather(
+            *(_summarize(llm, "\n\n".join(group), semaphore, stats) for group in groups)
+        ))
+
+    if len(partial) == 1:
+        return partial[0], stats
+    return await _summarize(llm, "\n\n".join(partial), semaphore, stats), stats
@@ -1,6 +1,12 @@
 # backend/app/services/document_service.py
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+from itertools import chain, islice
+import csv
+import io
+import multiprocessing
 import os
+import threading
 import pandas as pd
 from langchain.schema import Document
 
@@ -10,6 +16,14 @@ try:
 except Exception:
     PdfReader = None
 
+try:
+    import pymupdf  # much faster text extraction than pypdf
+except Exception:
+    try:
+        import fitz as pymupdf  # older PyMuPDF releases
+    except Exception:
+        pymupdf = None
+
 # PPTX
 try:
     from pptx import Presentation
@@ -22,27 +36,161 @@ try:
 except Exception:
     docx = None
 
+# XLSX (streamed in read-only mode)
+try:
+    import openpyxl
+except Exception:
+    openpyxl = None
 
-def _extract_pdf(file_path: str) -> List[Document]:
+# Worker processes that parse uploaded files in parallel (0 = parse in-process)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Spreadsheet rows are grouped into documents of about this many characters,
+# header included, so a row group usually fits in a single chunk
+TABLE_GROUP_CHARS = int(os.getenv("TABLE_GROUP_CHARS", "1200"))
+# Rows pandas reads from a CSV at a time
+CSV_READ_ROWS = int(os.getenv("CSV_READ_ROWS", "5000"))
+
+# "auto" (PyMuPDF when installed, else pypdf), "pymupdf" or "pypdf"
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto").lower()
+# Pages per extraction task when a PDF is split across the process pool
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+# Types extracted as a lazy stream of documents (memory independent of file size)
+STREAMABLE_EXTENSIONS = {".csv", ".xlsx", ".pdf"}
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+_extraction_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Shared process pool for document extraction (None when EXTRACT_WORKERS=0).
+    Workers are spawned rather than forked so they never inherit the
+    embedding model's threads or the parent's open store handles.
+    Inside a pool worker this is always None, so extractors never nest pools.
+    """
+    global _extraction_pool
+    if EXTRACT_WORKERS <= 0 or multiprocessing.parent_process() is not None:
+        return None
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extraction_pool
+
+
+def shutdown_extraction_pool() -> None:
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is not None:
+            _extraction_pool.shutdown(wait=False, cancel_futures=True)
+            _extraction_pool = None
+
+
+def pdf_backend() -> str:
+    """
+    PDF library in use, from PDF_BACKEND.
+    """
+    if PDF_BACKEND == "pymupdf" or (PDF_BACKEND == "auto" and pymupdf is not None):
+        if pymupdf is None:
+            raise RuntimeError("PyMuPDF is not installed")
+        return "pymupdf"
     if PdfReader is None:
         raise RuntimeError("pypdf is not installed")
+    return "pypdf"
+
+
+def pdf_page_count(file_path: str, backend: Optional[str] = None) -> int:
+    if (backend or pdf_backend()) == "pymupdf":
+        with pymupdf.open(file_path) as pdf:
+            return pdf.page_count
+    return len(PdfReader(file_path).pages)
+
+
+def _pdf_page_document(file_path: str, index: int, text: str) -> Optional[Document]:
+    if not text.strip():
+        return None
+    return Document(
+        page_content=text,
+        metadata={"source": os.path.basename(file_path), "page": index + 1},
+    )
+
+
+def _extract_pdf_range(file_path: str, start: int, end: int, backend: Optional[str] = None) -> List[Document]:
+    """
+    Documents for pages [start, end) (0-based); pages without text are skipped.
+    Top-level so it can run in a pool worker.
+    """
+    backend = backend or pdf_backend()
     docs: List[Document] = []
+    if backend == "pymupdf":
+        with pymupdf.open(file_path) as pdf:
+            for i in range(start, min(end, pdf.page_count)):
+                try:
+                    text = pdf[i].get_text("text") or ""
+                except Exception:
+                    text = ""
+                doc = _pdf_page_document(file_path, i, text)
+                if doc is not None:
+                    docs.append(doc)
+        return docs
+
     reader = PdfReader(file_path)
-    for i, page in enumerate(reader.pages):
+    for i in range(start, min(end, len(reader.pages))):
         try:
-            text = page.extract_text() or ""
+            text = reader.pages[i].extract_text() or ""
         except Exception:
             text = ""
-        if text.strip():
-            docs.append(
-                Document(
-                    page_content=text,
-                    metadata={"source": os.path.basename(file_path), "page": i + 1},
-                )
-            )
+        doc = _pdf_page_document(file_path, i, text)
+        if doc is not None:
+            docs.append(doc)
     return docs
 
 
+def _extract_pdf(file_path: str) -> List[Document]:
+    return _extract_pdf_range(file_path, 0, pdf_page_count(file_path))
+
+
+def iter_pdf_pages(
+    file_path: str,
+    pool: Optional[ProcessPoolExecutor] = None,
+    pages_per_task: Optional[int] = None
+) -> Iterator[Document]:
+    """
+    Page documents in order, extracted PDF_PAGES_PER_TASK pages at a time.
+    With a pool the ranges are parsed in parallel, a bounded number ahead of
+    the consumer, and pages are yielded as soon as their range is done, so
+    chunking and embedding start before the whole file is parsed.
+    The first ranges are submitted before this returns.
+    """
+    backend = pdf_backend()
+    step = max(pages_per_task or PDF_PAGES_PER_TASK, 1)
+    ranges = iter([(start, start + step) for start in range(0, pdf_page_count(file_path, backend), step)])
+
+    if pool is None:
+        return (doc for start, end in ranges for doc in _extract_pdf_range(file_path, start, end, backend))
+
+    # Keep every worker busy plus one range queued for each
+    ahead = max(EXTRACT_WORKERS, 1) * 2
+    pending = [pool.submit(_extract_pdf_range, file_path, start, end, backend) for start, end in islice(ranges, ahead)]
+
+    def pages() -> Iterator[Document]:
+        try:
+            while pending:
+                docs = pending.pop(0).result()
+                for start, end in islice(ranges, 1):
+                    pending.append(pool.submit(_extract_pdf_range, file_path, start, end, backend))
+                yield from docs
+        finally:
+            for future in pending:
+                future.cancel()
+
+    return pages()
+
+
 def _extract_pptx(file_path: str) -> List[Document]:
     if Presentation is None:
         raise RuntimeError("python-pptx is not installed")
@@ -98,27 +246,107 @@ def _extract_txt(file_path: str) -> List[Document]:
     return []
 
 
-def _extract_csv_xlsx(file_path: str) -> List[Document]:
-    ext = os.path.splitext(file_path)[1].lower()
+def _csv_line(values: Sequence[Any]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(["" if v is None else v for v in values])
+    return buf.getvalue()
+
+
+def _iter_row_groups(
+    source: str,
+    ext: str,
+    sheet: Optional[str],
+    header: Sequence[Any],
+    rows: Iterable[Tuple[int, Sequence[Any]]],
+) -> Iterator[Document]:
+    """
+    Group (row number, values) pairs into CSV documents of about
+    TABLE_GROUP_CHARS characters, each starting with the header row.
+    """
+    header_line = _csv_line(header)
+    lines: List[str] = []
+    size = len(header_line)
+    first = last = 0
+
+    def group() -> Document:
+        metadata = {"source": source, "type": ext, "row_start": first, "row_end": last}
+        if sheet is not None:
+            metadata["sheet"] = sheet
+        return Document(page_content=header_line + "".join(lines), metadata=metadata)
+
+    for row_number, values in rows:
+        if not any(v not in (None, "") for v in values):
+            continue
+        line = _csv_line(values)
+        if lines and size + len(line) > TABLE_GROUP_CHARS:
+            yield group()
+            lines, size = [], len(header_line)
+        if not lines:
+            first = row_number
+        lines.append(line)
+        size += len(line)
+        last = row_number
+    if lines:
+        yield group()
+
+
+def _iter_csv(file_path: str) -> Iterator[Document]:
     try:
-        if ext == ".csv":
-            df = pd.read_csv(file_path)
-        else:
-            # openpyxl engine is already in requirements
-            df = pd.read_excel(file_path, engine="openpyxl")
+        reader = pd.read_csv(file_path, chunksize=CSV_READ_ROWS, dtype=str, keep_default_na=False)
     except Exception:
-        return []
+        return
 
-    # Convert to CSV text for retrieval (simple & effective)
-    text = df.to_csv(index=False)
-    if text.strip():
-        return [
-            Document(
-                page_content=text,
-                metadata={"source": os.path.basename(file_path), "type": ext},
-            )
-        ]
-    return []
+    with reader:
+        frames = iter(reader)
+        first_frame = next(frames, None)
+        if first_frame is None:
+            return
+
+        def rows() -> Iterator[Tuple[int, Sequence[Any]]]:
+            # Spreadsheet numbering: the header is row 1
+            row_number = 1
+            for frame in chain([first_frame], frames):
+                for values in frame.itertuples(index=False, name=None):
+                    row_number += 1
+                    yield row_number, values
+
+        yield from _iter_row_groups(os.path.basename(file_path), ".csv", None, list(first_frame.columns), rows())
+
+
+def _iter_xlsx(file_path: str) -> Iterator[Document]:
+    if openpyxl is None:
+        raise RuntimeError("openpyxl is not installed")
+    try:
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    except Exception:
+        return
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        for sheet in workbook.worksheets:
+            rows = enumerate(sheet.iter_rows(values_only=True), start=1)
+            header: Optional[Sequence[Any]] = None
+            for _, values in rows:
+                if any(v not in (None, "") for v in values):
+                    header = values
+                    break
+            if header is not None:
+                yield from _iter_row_groups(os.path.basename(file_path), ext, sheet.title, header, rows)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_xlsx(file_path: str) -> Iterator[Document]:
+    """
+    Row-group documents of every sheet, read a slice at a time
+    (pandas chunks for CSV, openpyxl read-only mode for XLSX).
+    """
+    if os.path.splitext(file_path)[1].lower() == ".csv":
+        return _iter_csv(file_path)
+    return _iter_xlsx(file_path)
+
+
+def _extract_csv_xlsx(file_path: str) -> List[Document]:
+    return list(_iter_csv_xlsx(file_path))
 
 
 def extract_text_from_file(file_path: str) -> str:
@@ -126,6 +354,24 @@ def extract_text_from_file(file_path: str) -> str:
     return "\n\n".join([d.page_content for d in docs])
 
 
+def is_streamable(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in STREAMABLE_EXTENSIONS
+
+
+def iter_documents(file_path: str) -> Iterator[Document]:
+    """
+    Like load_documents, but lazy for STREAMABLE_EXTENSIONS so a large
+    spreadsheet is never held in memory as a whole.
+    """
+    if is_streamable(file_path):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"{file_path} not found")
+        if file_path.lower().endswith(".pdf"):
+            return iter_pdf_pages(file_path, get_extraction_pool())
+        return _iter_csv_xlsx(file_path)
+    return iter(load_documents(file_path))
+
+
 def load_documents(file_path: str) -> List[Document]:
     """
     Load file and return a list of langchain.schema.Document objects.
@@ -0,0 +1,272 @@
+# backend/app/services/embedding_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.metrics_service import register_stats
+
+BASE_DIR = Path(__file__).resolve().parents[2]  # backend/
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "embedding_cache.sqlite3"))
+# ~3 KB per 768-d vector, so the default bounds the cache at roughly 300 MB
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# Recent query embeddings kept in memory (the answer cache and retrieval
+# embed the same question)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+# SQLite's bound-parameter limit is 999 on older builds
+_SQL_BATCH = 500
+
+
+# Hit/miss tally of the caller (e.g. one ingestion job) running in this context
+_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("embedding_cache_usage", default=None)
+
+
+@contextmanager
+def track_cache_usage() -> Iterator[Dict[str, int]]:
+    """
+    Count the cache hits and misses of lookups made in this context,
+    including threads started with asyncio.to_thread (they copy the context),
+    apart from those of concurrent callers.
+    """
+    usage = {"hits": 0, "misses": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent (namespace, text hash) -> vector store backed by SQLite.
+    Least-recently-used rows are evicted once max_entries is exceeded.
+    """
+
+    def __init__(self, path: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                namespace TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, namespace: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique), _SQL_BATCH):
+                part = unique[i:i + _SQL_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE namespace = ? AND text_hash IN ({marks})",
+                    [namespace, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[h] = vec.tolist()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE namespace = ? AND text_hash = ?",
+                        [(now, namespace, h) for h, _ in rows],
+                    )
+            self._conn.commit()
+            hit_count = sum(1 for h in hashes if h in found)
+            self.hits += hit_count
+            self.misses += len(hashes) - hit_count
+            usage = _usage.get()
+            if usage is not None:
+                usage["hits"] += hit_count
+                usage["misses"] += len(hashes) - hit_count
+        return found
+
+    def put_many(self, namespace: str, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (namespace, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(namespace, h, array("f", vec).tobytes(), now) for h, vec in items.items()],
+            )
+            self._count += self._conn.total_changes - before
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._count -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only encodes texts missing from the cache.
+    Query embeddings skip the persistent cache but recent ones are memoised.
+    """
+
+    def __init__(self, embeddings: Embeddings, namespace: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.cache = cache
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.namespace, hashes)
+
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = t
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.namespace, new_items)
+            found.update(new_items)
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._queries_lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                return vector
+        vector = self.embeddings.embed_query(text)
+        self._remember_queries({text: vector})
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Batch counterpart of embed_query: memoised queries are reused, the
+        rest are encoded in one pass and memoised.
+        """
+        with self._queries_lock:
+            found = {t: self._queries[t] for t in texts if t in self._queries}
+        missing = list(dict.fromkeys(t for t in texts if t not in found))
+        if missing:
+            new_items = dict(zip(missing, embed_queries(self.embeddings, missing)))
+            self._remember_queries(new_items)
+            found.update(new_items)
+        return [found[t] for t in texts]
+
+    def _remember_queries(self, items: Dict[str, List[float]]) -> None:
+        with self._queries_lock:
+            for text, vector in items.items():
+                self._queries[text] = vector
+                self._queries.move_to_end(text)
+            while len(self._queries) > max(QUERY_EMBEDDING_CACHE_SIZE, 1):
+                self._queries.popitem(last=False)
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several queries in one forward pass when the wrapper supports it.
+    """
+    batch = getattr(embeddings, "embed_queries", None)
+    if batch is not None:
+        return batch(texts)
+    # HuggingFaceEmbeddings.embed_query is embed_documents([text])[0]
+    return embeddings.embed_documents(texts)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+        return _cache
+
+
+register_stats(
+    "rag_embedding_cache",
+    lambda: _cache.stats() if _cache is not None else {},
+    counters=("hits", "misses", "evictions"),
+)
+
+
+def cache_namespace(embeddings: Embeddings, runtime: Optional[str] = None) -> str:
+    """
+    Cache namespace for a model: vectors from different models, runtimes or
+    encode settings must never be mixed. batch_size does not change vectors
+    and is left out.
+    """
+    name = getattr(embeddings, "model_name", type(embeddings).__name__)
+    encode_kwargs = dict(getattr(embeddings, "encode_kwargs", {}) or {})
+    encode_kwargs.pop("batch_size", None)
+    if runtime and runtime != "torch":
+        name = f"{name}@{runtime}"
+    return f"{name}|{json.dumps(encode_kwargs, sort_keys=True, default=str)}"
+
+
+def with_embedding_cache(embeddings: Embeddings, namespace: Optional[str] = None) -> Embeddings:
+    """
+    Wrap a model with the persistent cache (no-op when EMBEDDING_CACHE is off).
+    namespace defaults to cache_namespace(embeddings).
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    return CachedEmbeddings(embeddings, namespace or cache_namespace(embeddings), get_embedding_cache())
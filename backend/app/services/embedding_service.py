@@ -1,8 +1,298 @@
+# backend/app/services/embedding_service.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from app.services.metrics_service import counter, observe_stage, register_stats, timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "BAAI/bge-base-en")
+DEFAULT_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+# "torch" (sentence-transformers as is), "quantized" (int8 dynamic
+# quantization of the Linear layers) or "onnx" (ONNX Runtime export,
+# needs `pip install optimum[onnxruntime]`)
+DEFAULT_RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch").lower()
+# Texts per forward pass (sentence-transformers' default is 32)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Intra-op CPU threads for the forward pass (0 = library default)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+DEFAULT_ENCODE_KWARGS: Dict[str, Any] = {"normalize_embeddings": True, "batch_size": EMBEDDING_BATCH_SIZE}
+
+# Concurrent query embeddings arriving within this window share one forward
+# pass (0 disables batching)
+EMBEDDING_QUERY_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_QUERY_BATCH_WAIT_MS", "2"))
+EMBEDDING_QUERY_BATCH_SIZE = int(os.getenv("EMBEDDING_QUERY_BATCH_SIZE", "32"))
+
+RUNTIMES = ("torch", "quantized", "onnx")
+
+EMBEDDED_TEXTS = counter("rag_embedded_texts_total", "Texts run through the embedding model", ("kind",))
+
+RegistryKey = Tuple[str, str, str, Tuple[Tuple[str, Any], ...]]
+
+# Process-wide registry: one loaded model per (model name, device, runtime, encode kwargs)
+_registry: Dict[RegistryKey, HuggingFaceEmbeddings] = {}
+_registry_stats: Dict[RegistryKey, Dict[str, Any]] = {}
+# id(model) -> runtime it actually runs on (onnx falls back to torch)
+_runtimes: Dict[int, str] = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(model_name: str, device: str, runtime: str, encode_kwargs: Dict[str, Any]) -> RegistryKey:
+    return (model_name, device, runtime, tuple(sorted(encode_kwargs.items())))
 
-def get_embeddings_model():
-    return HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
+
+def _load_model(
+    model_name: str, device: str, runtime: str, encode_kwargs: Dict[str, Any]
+) -> Tuple[HuggingFaceEmbeddings, str]:
+    """
+    Load a model on the requested runtime. Returns it with the runtime
+    actually used: an ONNX load that fails falls back to torch.
+    """
+    if EMBEDDING_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+
+    if runtime == "onnx":
+        onnx_kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider"}
+        if EMBEDDING_THREADS > 0:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = EMBEDDING_THREADS
+            onnx_kwargs["session_options"] = options
+        try:
+            model = HuggingFaceEmbeddings(
+                model_name=model_name,
+                model_kwargs={"device": device, "backend": "onnx", "model_kwargs": onnx_kwargs},
+                encode_kwargs=encode_kwargs,
+            )
+            return model, "onnx"
+        except Exception as e:
+            logger.warning("ONNX runtime unavailable for %s (%s); falling back to torch", model_name, e)
+            runtime = "torch"
+
+    model = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": device},
+        encode_kwargs=encode_kwargs,
     )
+    if runtime == "quantized":
+        import torch
+        # int8 weights for every Linear layer; activations stay float
+        transformer = model.client[0]
+        transformer.auto_model = torch.ao.quantization.quantize_dynamic(
+            transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model, runtime
+
+
+def _model_memory_bytes(embeddings: HuggingFaceEmbeddings) -> Optional[int]:
+    """
+    Size of the model's parameters and buffers in bytes (None if unavailable).
+    """
+    client = getattr(embeddings, "client", None)
+    if client is None or not hasattr(client, "parameters"):
+        return None
+    try:
+        tensors = list(client.parameters()) + list(client.buffers())
+        return int(sum(t.numel() * t.element_size() for t in tensors))
+    except Exception:
+        return None
+
+
+def get_embeddings_model(
+    model_name: Optional[str] = None,
+    device: Optional[str] = None,
+    encode_kwargs: Optional[Dict[str, Any]] = None,
+    runtime: Optional[str] = None,
+) -> HuggingFaceEmbeddings:
+    """
+    Return the shared embedding model for the given configuration.
+    The model is loaded once per process (lazily on first use or via warm_up)
+    and reused by every caller afterwards.
+    """
+    model_name = model_name or DEFAULT_MODEL_NAME
+    device = device or DEFAULT_DEVICE
+    runtime = (runtime or DEFAULT_RUNTIME).lower()
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown embedding runtime '{runtime}'; expected one of {', '.join(RUNTIMES)}")
+    encode_kwargs = dict(DEFAULT_ENCODE_KWARGS if encode_kwargs is None else encode_kwargs)
+    key = _registry_key(model_name, device, runtime, encode_kwargs)
+
+    model = _registry.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        # Another thread may have loaded it while we waited for the lock
+        model = _registry.get(key)
+        if model is not None:
+            return model
+
+        start = time.perf_counter()
+        model, loaded_runtime = _load_model(model_name, device, runtime, encode_kwargs)
+        load_seconds = time.perf_counter() - start
+
+        _registry[key] = model
+        _runtimes[id(model)] = loaded_runtime
+        _registry_stats[key] = {
+            "model_name": model_name,
+            "device": device,
+            "runtime": loaded_runtime,
+            "threads": EMBEDDING_THREADS or None,
+            "encode_kwargs": encode_kwargs,
+            "load_seconds": round(load_seconds, 3),
+            "memory_bytes": _model_memory_bytes(model),
+            "loaded_at": time.time(),
+        }
+        logger.info(
+            "Loaded embedding model %s on %s (%s) in %.2fs", model_name, device, loaded_runtime, load_seconds
+        )
+        return model
+
+
+def embedding_runtime(model: Embeddings) -> str:
+    """
+    Runtime a registry model runs on ("torch" for anything else).
+    """
+    return _runtimes.get(id(model), "torch")
+
+
+class QueryBatcher(Embeddings):
+    """
+    Merges concurrent embed_query calls into one embed_documents call.
+    The first caller waits EMBEDDING_QUERY_BATCH_WAIT_MS for others to
+    join, then encodes everything queued (up to EMBEDDING_QUERY_BATCH_SIZE
+    per pass) on behalf of all of them. Document embedding is unchanged.
+    """
+
+    def __init__(self, embeddings: Embeddings, wait_ms: float, max_batch: int):
+        self.embeddings = embeddings
+        self.wait_seconds = wait_ms / 1000
+        self.max_batch = max(max_batch, 1)
+        self.batches = 0
+        self.queries = 0
+        self._pending: List[Tuple[str, Future]] = []
+        self._leading = False
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with timed("embed"):
+            vectors = self.embeddings.embed_documents(texts)
+        EMBEDDED_TEXTS.inc(len(texts), kind="document")
+        return vectors
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a known batch of queries in one pass, without the wait window.
+        """
+        with timed("embed_query"):
+            vectors = self.embeddings.embed_documents(texts)
+        EMBEDDED_TEXTS.inc(len(texts), kind="query")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            lead = not self._leading
+            self._leading = True
+        if lead:
+            self._drain()
+        return future.result()
+
+    def _drain(self) -> None:
+        time.sleep(self.wait_seconds)
+        while True:
+            with self._lock:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                if not batch:
+                    self._leading = False
+                    return
+            started = time.perf_counter()
+            try:
+                # HuggingFaceEmbeddings.embed_query is embed_documents([text])[0]
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+                observe_stage("embed_query", time.perf_counter() - started)
+                EMBEDDED_TEXTS.inc(len(batch), kind="query")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "wait_ms": self.wait_seconds * 1000,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "queries": self.queries,
+                "mean_batch": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            }
+
+
+_batchers: Dict[int, QueryBatcher] = {}
+
+
+def with_query_batching(model: Embeddings) -> Embeddings:
+    """
+    Shared QueryBatcher for a model (the model itself when batching is off).
+    """
+    if EMBEDDING_QUERY_BATCH_WAIT_MS <= 0:
+        return model
+    with _registry_lock:
+        batcher = _batchers.get(id(model))
+        if batcher is None:
+            batcher = _batchers[id(model)] = QueryBatcher(
+                model, EMBEDDING_QUERY_BATCH_WAIT_MS, EMBEDDING_QUERY_BATCH_SIZE
+            )
+        return batcher
+
+
+def _batching_stats() -> Dict[str, int]:
+    with _registry_lock:
+        batchers = list(_batchers.values())
+    stats = [b.stats() for b in batchers]
+    return {"batches": sum(s["batches"] for s in stats), "queries": sum(s["queries"] for s in stats)}
+
+
+register_stats("rag_query_batching", _batching_stats, counters=("batches", "queries"))
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Load the default embedding model and run one encode so the first request
+    does not pay for weight loading or lazy kernel initialisation.
+    """
+    model = get_embeddings_model()
+    model.embed_query("warm up")
+    key = _registry_key(DEFAULT_MODEL_NAME, DEFAULT_DEVICE, DEFAULT_RUNTIME, DEFAULT_ENCODE_KWARGS)
+    return dict(_registry_stats[key])
+
+
+def get_model_stats() -> List[Dict[str, Any]]:
+    """
+    Load time, memory footprint and query batching of every model held by
+    the registry.
+    """
+    with _registry_lock:
+        stats = []
+        for key, entry in _registry_stats.items():
+            entry = dict(entry)
+            batcher = _batchers.get(id(_registry[key]))
+            if batcher is not None:
+                entry["query_batching"] = batcher.stats()
+            stats.append(entry)
+    return stats
@@ -0,0 +1,347 @@
+# backend/app/services/ingest_service.py
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from app.services.chunking_service import iter_chunks
+from app.services.document_service import get_extraction_pool, is_streamable, iter_documents, load_documents
+from app.services.embedding_cache import text_hash
+from app.services.metrics_service import TimedIterator, observe_stage, timed
+from app.services.vector_service import (
+    EMBED_BATCH_SIZE,
+    add_documents,
+    delete_documents,
+    persist_vector_store,
+    resolve_path,
+)
+
+# Per-store record of indexed sources, kept inside the store directory so
+# reset_vector_store wipes it together with the embeddings
+MANIFEST_NAME = "sources.json"
+
+# Concurrent embedding passes allowed across files
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "1"))
+
+_manifest_locks: Dict[str, threading.Lock] = {}
+_manifest_locks_guard = threading.Lock()
+_embed_semaphore = threading.BoundedSemaphore(max(EMBED_CONCURRENCY, 1))
+
+
+def _manifest_lock(abs_path: str) -> threading.Lock:
+    with _manifest_locks_guard:
+        lock = _manifest_locks.get(abs_path)
+        if lock is None:
+            lock = _manifest_locks[abs_path] = threading.Lock()
+        return lock
+
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    sha256 of the file contents.
+    """
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(source: str, doc: Document) -> str:
+    """
+    Stable chunk ID derived from the source name, the chunk's location in it
+    and its content, so re-ingesting an unchanged chunk overwrites itself.
+    """
+    meta = doc.metadata
+    location = "|".join(
+        str(meta.get(key, "")) for key in ("page", "slide", "sheet", "chunk", "start_index")
+    )
+    if "row_start" in meta:
+        location += f"|{meta['row_start']}"
+    key = f"{source}\x00{location}\x00{text_hash(doc.page_content)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _manifest_path(abs_path: str) -> Path:
+    return Path(abs_path) / MANIFEST_NAME
+
+
+def load_manifest(store_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    path = _manifest_path(resolve_path(store_path))
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(abs_path: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    path = _manifest_path(abs_path)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def list_sources(store_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Indexed sources with their fingerprint, chunk count and index time.
+    """
+    manifest = load_manifest(store_path)
+    return [
+        {
+            "source": source,
+            "fingerprint": entry.get("fingerprint"),
+            "chunks": len(entry.get("ids", [])),
+            "indexed_at": entry.get("indexed_at"),
+        }
+        for source, entry in sorted(manifest.items())
+    ]
+
+
+def _with_ids(source: str, chunks: Iterable[Document], ids: List[str]) -> Iterator[Document]:
+    for chunk in chunks:
+        chunk.id = chunk_id(source, chunk)
+        ids.append(chunk.id)
+        yield chunk
+
+
+def _counted(docs: Iterable[Document], counter: Dict[str, int]) -> Iterator[Document]:
+    for doc in docs:
+        counter["documents"] += 1
+        yield doc
+
+
+def _take(items: Iterator[Document], size: int) -> List[Document]:
+    return list(islice(items, max(size, 1)))
+
+
+def _previous_entry(abs_path: str, source: str) -> Optional[Dict[str, Any]]:
+    with _manifest_lock(abs_path):
+        return load_manifest(abs_path).get(source)
+
+
+def _write_batch(batch: List[Document], abs_path: str) -> int:
+    # One embedding pass at a time: concurrent forward passes only oversubscribe the CPU
+    with _embed_semaphore:
+        return add_documents(batch, store_path=abs_path, batch_size=len(batch), persist=False)
+
+
+def _finish_ingest(abs_path: str, stale: List[str], updates: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Delete stale chunks, flush the store once and record all sources at once.
+    """
+    if stale:
+        delete_documents(stale, store_path=abs_path, persist=False)
+    persist_vector_store(abs_path)
+    if updates:
+        with _manifest_lock(abs_path):
+            manifest = load_manifest(abs_path)
+            manifest.update(updates)
+            _save_manifest(abs_path, manifest)
+
+
+async def iter_ingest_files(
+    file_paths: List[str],
+    store_path: Optional[str] = None,
+    incremental: bool = True,
+    on_stage: Optional[Callable[[str, str], None]] = None,
+    batch_size: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Ingest several files concurrently without blocking the event loop and
+    yield each file's result as soon as its chunks are written.
+    Files are parsed in parallel on the extraction process pool. Their chunks
+    are pooled across the whole request and embedded/written in full
+    EMBED_BATCH_SIZE batches in a worker thread, with a single persist and
+    manifest update at the end, so the number of files does not multiply
+    embedding calls or disk flushes. Streamable types are consumed from a
+    worker thread one batch of chunks at a time, so a large file is never
+    held in memory: CSV/XLSX rows are read in the thread, PDF page ranges
+    are parsed on the pool and embedded as soon as each range is ready.
+    on_stage(source, stage) is called on the event loop as each file moves
+    through fingerprinting, extracting and embedding.
+    A file whose extraction fails, or whose chunks were in a batch that
+    failed to write, is reported failed and left out of the manifest.
+    """
+    abs_path = resolve_path(store_path)
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+
+    def stage(source: str, name: str) -> None:
+        if on_stage is not None:
+            on_stage(source, name)
+
+    async def extract(file_path: str) -> Dict[str, Any]:
+        source = os.path.basename(file_path)
+        try:
+            stage(source, "fingerprinting")
+            fingerprint = await asyncio.to_thread(file_fingerprint, file_path)
+            previous = await asyncio.to_thread(_previous_entry, abs_path, source)
+            if incremental and previous and previous.get("fingerprint") == fingerprint:
+                return {"source": source, "status": "unchanged", "documents": 0, "chunks": 0}
+
+            if is_streamable(file_path):
+                # Opening the stream already queues a PDF's first page ranges on the pool
+                started = time.perf_counter()
+                stream = await asyncio.to_thread(iter_documents, file_path)
+                return {"source": source, "status": "extracted", "fingerprint": fingerprint,
+                        "previous": previous, "stream": stream, "open_seconds": time.perf_counter() - started}
+
+            stage(source, "extracting")
+            with timed("extract"):
+                if pool is not None:
+                    docs = await loop.run_in_executor(pool, load_documents, file_path)
+                else:
+                    docs = await asyncio.to_thread(load_documents, file_path)
+            return {"source": source, "status": "extracted", "fingerprint": fingerprint,
+                    "previous": previous, "docs": docs}
+        except Exception as e:
+            return {"source": source, "status": "failed", "error": str(e), "documents": 0, "chunks": 0}
+
+    def chunk(source: str, docs: List[Document], ids: List[str]) -> List[Document]:
+        with timed("chunk"):
+            return list(_with_ids(source, iter_chunks(docs), ids))
+
+    buffer: List[Tuple[str, Document]] = []  # (source, chunk) waiting for a full batch
+    unwritten: Dict[str, int] = {}  # source -> its buffered chunks not written yet
+    waiting: Dict[str, Dict[str, Any]] = {}  # source -> result, once all its chunks are buffered
+    failed: List[Dict[str, Any]] = []
+    updates: Dict[str, Dict[str, Any]] = {}
+    stale: Dict[str, List[str]] = {}  # source -> ids of its previous version to delete
+
+    def queue(source: str, chunks: List[Document]) -> None:
+        buffer.extend((source, chunk) for chunk in chunks)
+        unwritten[source] = unwritten.get(source, 0) + len(chunks)
+
+    def fail(source: str, error: str) -> None:
+        # Drop the source's unwritten chunks and its manifest update; chunks
+        # already written are overwritten (same ids) when it is ingested again
+        buffer[:] = [(owner, chunk) for owner, chunk in buffer if owner != source]
+        unwritten.pop(source, None)
+        updates.pop(source, None)
+        stale.pop(source, None)
+        waiting.pop(source, None)
+        failed.append({"source": source, "status": "failed", "error": error, "documents": 0, "chunks": 0})
+
+    async def write(batch: List[Tuple[str, Document]]) -> None:
+        try:
+            await asyncio.to_thread(_write_batch, [chunk for _, chunk in batch], abs_path)
+        except Exception as e:
+            # A batch pools chunks of several files: every one of them failed
+            for source in sorted({source for source, _ in batch}):
+                fail(source, str(e))
+            return
+        for source, _ in batch:
+            if source in unwritten:
+                unwritten[source] -= 1
+
+    async def write_full_batches() -> None:
+        while len(buffer) >= batch_size:
+            batch, buffer[:] = buffer[:batch_size], buffer[batch_size:]
+            await write(batch)
+
+    def finished() -> List[Dict[str, Any]]:
+        done = failed[:]
+        failed.clear()
+        for source in [source for source in waiting if not unwritten.get(source)]:
+            done.append(waiting.pop(source))
+        return done
+
+    tasks = [asyncio.create_task(extract(p)) for p in file_paths]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if item["status"] != "extracted":
+                yield item
+                continue
+
+            source, previous = item["source"], item["previous"]
+            ids: List[str] = []
+            updates[source] = {"fingerprint": item["fingerprint"], "ids": ids, "indexed_at": time.time()}
+            if "stream" in item:
+                stage(source, "extracting")
+                counter = {"documents": 0}
+                extracted = TimedIterator(_counted(item["stream"], counter))
+                chunked = TimedIterator(iter_chunks(extracted))
+                stream = _with_ids(source, chunked, ids)
+                chunk_count = 0
+                while source in updates:
+                    # Read only what fills the current batch, then write it
+                    try:
+                        part = await asyncio.to_thread(_take, stream, batch_size - len(buffer))
+                    except Exception as e:
+                        fail(source, str(e))
+                        break
+                    if not part:
+                        break
+                    if not chunk_count:
+                        stage(source, "embedding")
+                    queue(source, part)
+                    chunk_count += len(part)
+                    await write_full_batches()
+                if source not in updates:
+                    for result in finished():
+                        yield result
+                    continue
+                document_count = counter["documents"]
+                observe_stage("extract", item["open_seconds"] + extracted.seconds)
+                observe_stage("chunk", chunked.seconds - extracted.seconds)
+            else:
+                stage(source, "embedding")
+                try:
+                    chunks = await asyncio.to_thread(chunk, source, item["docs"], ids)
+                except Exception as e:
+                    fail(source, str(e))
+                    for result in finished():
+                        yield result
+                    continue
+                queue(source, chunks)
+                chunk_count, document_count = len(chunks), len(item["docs"])
+
+            if previous:
+                stale[source] = sorted(set(previous.get("ids", [])) - set(ids))
+            waiting[source] = {
+                "source": source,
+                "status": "updated" if previous else "added",
+                "documents": document_count,
+                "chunks": chunk_count,
+            }
+
+            await write_full_batches()
+            for result in finished():
+                yield result
+
+        if buffer:
+            batch, buffer[:] = buffer[:], []
+            await write(batch)
+        await asyncio.to_thread(_finish_ingest, abs_path, [doc_id for old in stale.values() for doc_id in old], updates)
+        for result in finished():
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def delete_source(source: str, store_path: Optional[str] = None) -> int:
+    """
+    Remove every chunk of one source from the store.
+    Raises KeyError if the source is not indexed.
+    """
+    abs_path = resolve_path(store_path)
+    with _manifest_lock(abs_path):
+        manifest = load_manifest(abs_path)
+        entry = manifest.pop(source)
+        delete_documents(entry.get("ids", []), store_path=abs_path)
+        _save_manifest(abs_path, manifest)
+    return len(entry.get("ids", []))
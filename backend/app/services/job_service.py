@@ -0,0 +1,156 @@
+# backend/app/services/job_service.py
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.services.embedding_cache import EMBEDDING_CACHE_ENABLED, track_cache_usage
+from app.services.ingest_service import iter_ingest_files
+from app.services.vector_service import reset_vector_store
+
+# Ingestion jobs allowed to run at once; the rest wait in the queue
+INGEST_MAX_CONCURRENT_JOBS = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "1"))
+# Finished jobs kept around for status queries
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "100"))
+
+
+class IngestJob:
+    """
+    State of one background ingestion job, updated as its files progress.
+    """
+
+    def __init__(self, store_path: str, mode: str):
+        self.id = uuid.uuid4().hex
+        self.store_path = store_path
+        self.mode = mode
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.errors: List[str] = []
+        self.embedding_cache: Optional[Dict[str, int]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def add_file(self, source: str) -> None:
+        self.files[source] = {"stage": "queued", "documents": 0, "chunks": 0}
+
+    def set_stage(self, source: str, stage: str) -> None:
+        self.files.setdefault(source, {"documents": 0, "chunks": 0})["stage"] = stage
+
+    def to_dict(self) -> Dict[str, Any]:
+        documents = sum(f["documents"] for f in self.files.values())
+        chunks = sum(f["chunks"] for f in self.files.values())
+        done = sum(1 for f in self.files.values() if f["stage"] in ("done", "unchanged", "failed"))
+
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        result = {
+            "job_id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "chroma_dir_used": self.store_path,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "files_total": len(self.files),
+            "files_done": done,
+            "files": self.files,
+            "documents_indexed": documents,
+            "chunks_indexed": chunks,
+            "chunks_per_second": round(chunks / elapsed, 2) if elapsed else None,
+            "unchanged": [s for s, f in self.files.items() if f["stage"] == "unchanged"],
+            "failed": self.errors,
+        }
+        if self.embedding_cache is not None:
+            result["embedding_cache"] = self.embedding_cache
+        return result
+
+
+_jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+_job_slots: Optional[asyncio.Semaphore] = None
+
+
+def _slots() -> asyncio.Semaphore:
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(max(INGEST_MAX_CONCURRENT_JOBS, 1))
+    return _job_slots
+
+
+def _prune_history() -> None:
+    finished = [j for j in _jobs.values() if j.status in ("completed", "failed")]
+    for job in finished[:max(len(finished) - INGEST_JOB_HISTORY, 0)]:
+        _jobs.pop(job.id, None)
+
+
+def create_job(store_path: str, mode: str) -> IngestJob:
+    job = IngestJob(store_path, mode)
+    _jobs[job.id] = job
+    _prune_history()
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    return _jobs.get(job_id)
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    return [job.to_dict() for job in reversed(_jobs.values())]
+
+
+async def _run_job(job: IngestJob, file_paths: List[str], upload_dir: Optional[str]) -> None:
+    async with _slots():
+        job.status = "running"
+        job.started_at = time.time()
+        # Counted per job: the cache's own counters mix concurrent jobs
+        with track_cache_usage() as cache_usage:
+            try:
+                # Replace mode resets once for the whole batch
+                incremental = job.mode == "incremental"
+                if not incremental:
+                    await asyncio.to_thread(reset_vector_store, job.store_path)
+
+                async for result in iter_ingest_files(
+                    file_paths,
+                    store_path=job.store_path,
+                    incremental=incremental,
+                    on_stage=job.set_stage,
+                ):
+                    entry = job.files.setdefault(result["source"], {})
+                    entry.update(documents=result["documents"], chunks=result["chunks"])
+                    if result["status"] == "failed":
+                        entry.update(stage="failed", error=result["error"])
+                        job.errors.append(f"{result['source']} (process error: {result['error']})")
+                    else:
+                        entry["stage"] = "unchanged" if result["status"] == "unchanged" else "done"
+
+                ok = any(f["stage"] in ("done", "unchanged") for f in job.files.values())
+                job.status = "completed" if ok else "failed"
+            except Exception as e:
+                job.errors.append(str(e))
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                if EMBEDDING_CACHE_ENABLED:
+                    job.embedding_cache = dict(cache_usage)
+                if upload_dir is not None:
+                    await asyncio.to_thread(shutil.rmtree, upload_dir, ignore_errors=True)
+
+
+def start_job(job: IngestJob, file_paths: List[str], upload_dir: Optional[str] = None) -> IngestJob:
+    """
+    Run the job in the background. It is not tied to the HTTP request, so it
+    keeps going if the client disconnects. upload_dir (the uploaded copies)
+    is deleted once the job is done.
+    """
+    for path in file_paths:
+        job.add_file(os.path.basename(path))
+    job.task = asyncio.create_task(_run_job(job, file_paths, upload_dir))
+    return job
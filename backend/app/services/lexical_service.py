@@ -0,0 +1,337 @@
+# backend/app/services/lexical_service.py
+import asyncio
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from app.services.embedding_cache import text_hash
+
+# File inside each store holding the BM25 index (wiped with the store).
+# Stores indexed with the older lexical_index.json get it rebuilt once.
+LEXICAL_INDEX_NAME = "lexical_index.sqlite3"
+
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Reciprocal rank fusion constant (60 is the value from the original paper)
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Each leg of a hybrid search fetches this many times k candidates
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "2"))
+
+# Ids per SQL "IN (...)" query (SQLite caps bound parameters)
+_SQL_BATCH = 500
+
+# Words like part numbers ("AB-1234") and column names ("unit_price") are
+# kept whole and also indexed by their parts
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where",
+    "which", "who", "why", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        tokens.append(word)
+        parts = re.split(r"[-_./]", word)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in _STOPWORDS)
+    return tokens
+
+
+def doc_key(doc: Document) -> str:
+    """
+    Identity of a chunk across retrievers. Content based, because vector
+    hits come back without their id.
+    """
+    return text_hash(f"{doc.metadata.get('source', '')}\x00{doc.page_content}")
+
+
+class BM25Index:
+    """
+    Inverted index over a store's chunks, scored with Okapi BM25.
+    Postings, chunk lengths and texts all live in SQLite next to the vector
+    store: a worker keeps no copy of the corpus in memory, a search reads
+    the postings of its query terms and the texts of its top hits, and
+    every process sees the others' writes as soon as they commit.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.inode: Optional[int] = None
+        self.lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _file_inode(self) -> Optional[int]:
+        try:
+            return self.path.stat().st_ino
+        except OSError:
+            return None
+
+    def exists(self) -> bool:
+        return self._file_inode() is not None
+
+    def _connect(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        """
+        The index database, reopened when the file was replaced (store reset).
+        """
+        inode = self._file_inode()
+        if self._conn is not None and inode == self.inode:
+            return self._conn
+        self.close()
+        if inode is None and not create:
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Postings inserts land all over the (term, id) B-tree: give it 64 MB of page cache
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(docs)")}
+            if columns and "length" not in columns:
+                # Index written by an earlier version (texts only): rebuild it
+                old = conn.execute("SELECT id, text, metadata FROM docs").fetchall()
+                conn.execute("DROP TABLE docs")
+                conn.execute("DROP TABLE IF EXISTS changes")
+            else:
+                old = []
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs "
+                "(id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL, length INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings "
+                "(term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL, length INTEGER NOT NULL, "
+                "PRIMARY KEY (term, id)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO totals VALUES ('documents', 0), ('length', 0)")
+            if old:
+                self._write(conn, [(doc_id, text, json.loads(metadata)) for doc_id, text, metadata in old])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            conn.close()
+            raise
+        self._conn, self.inode = conn, self._file_inode()
+        return conn
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn, self.inode = None, None
+
+    @staticmethod
+    def _remove(conn: sqlite3.Connection, ids: List[str]) -> None:
+        documents = length = 0
+        for i in range(0, len(ids), _SQL_BATCH):
+            part = ids[i:i + _SQL_BATCH]
+            marks = ",".join("?" * len(part))
+            rows = conn.execute(f"SELECT id, text, length FROM docs WHERE id IN ({marks})", part).fetchall()
+            conn.executemany(
+                "DELETE FROM postings WHERE term = ? AND id = ?",
+                [(term, doc_id) for doc_id, text, _ in rows for term in set(tokenize(text))]
+            )
+            conn.execute(f"DELETE FROM docs WHERE id IN ({marks})", part)
+            documents += len(rows)
+            length += sum(row[2] for row in rows)
+        conn.execute("UPDATE totals SET value = value - ? WHERE name = 'documents'", (documents,))
+        conn.execute("UPDATE totals SET value = value - ? WHERE name = 'length'", (length,))
+
+    @classmethod
+    def _write(cls, conn: sqlite3.Connection, docs: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        # Last write wins for an id given twice
+        latest = {doc_id: (text, metadata) for doc_id, text, metadata in docs}
+        cls._remove(conn, list(latest))
+        rows, postings, length = [], [], 0
+        for doc_id, (text, metadata) in latest.items():
+            counts = Counter(tokenize(text))
+            doc_length = sum(counts.values())
+            rows.append((doc_id, text, json.dumps(metadata, ensure_ascii=False), doc_length))
+            postings.extend((term, doc_id, tf, doc_length) for term, tf in counts.items())
+            length += doc_length
+        conn.executemany("INSERT INTO docs (id, text, metadata, length) VALUES (?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO postings (term, id, tf, length) VALUES (?, ?, ?, ?)", postings)
+        conn.execute("UPDATE totals SET value = value + ? WHERE name = 'documents'", (len(rows),))
+        conn.execute("UPDATE totals SET value = value + ? WHERE name = 'length'", (length,))
+
+    def add(self, docs: Iterable[Document]) -> None:
+        """
+        Index (or re-index) chunks by id, committed at once.
+        """
+        batch = [(doc.id, doc.page_content, dict(doc.metadata)) for doc in docs]
+        if not batch:
+            return
+        with self.lock:
+            conn = self._connect(create=True)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write(conn, batch)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, ids: Iterable[str]) -> None:
+        ids = list(dict.fromkeys(ids))
+        with self.lock:
+            conn = self._connect()
+            if conn is None or not ids:
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._remove(conn, ids)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def save(self) -> None:
+        """
+        Writes commit as they happen; this only creates the (possibly
+        empty) index file, which marks the store as indexed.
+        """
+        with self.lock:
+            self._connect(create=True)
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """
+        Top-k chunks by BM25 score; chunks sharing no term with the query are skipped.
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            conn = self._connect()
+            if conn is None or not terms:
+                return []
+            # One read transaction, so a concurrent write is seen whole or not at all
+            conn.execute("BEGIN")
+            try:
+                totals = dict(conn.execute("SELECT name, value FROM totals"))
+                n = totals["documents"]
+                if not n:
+                    return []
+                avg_length = totals["length"] / n or 1.0
+                scores: Dict[str, float] = {}
+                for term in terms:
+                    posting = conn.execute("SELECT id, tf, length FROM postings WHERE term = ?", (term,)).fetchall()
+                    if not posting:
+                        continue
+                    idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for doc_id, tf, length in posting:
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+                top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+                if not top:
+                    return []
+                marks = ",".join("?" * len(top))
+                rows = {
+                    doc_id: (text, metadata)
+                    for doc_id, text, metadata in conn.execute(
+                        f"SELECT id, text, metadata FROM docs WHERE id IN ({marks})", [doc_id for doc_id, _ in top]
+                    )
+                }
+            finally:
+                conn.execute("COMMIT")
+        return [
+            (Document(id=doc_id, page_content=rows[doc_id][0], metadata=json.loads(rows[doc_id][1])), score)
+            for doc_id, score in top
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return {"documents": 0, "tokens": 0}
+            totals = dict(conn.execute("SELECT name, value FROM totals"))
+            return {"documents": totals["documents"], "tokens": totals["length"]}
+
+
+_indexes: Dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(abs_path: str) -> BM25Index:
+    """
+    The BM25 index of a store directory (one shared connection per process).
+    """
+    with _indexes_lock:
+        index = _indexes.get(abs_path)
+        if index is None:
+            index = _indexes[abs_path] = BM25Index(Path(abs_path) / LEXICAL_INDEX_NAME)
+        return index
+
+
+def drop_lexical_index(abs_path: str) -> None:
+    with _indexes_lock:
+        index = _indexes.pop(abs_path, None)
+    if index is not None:
+        index.close()
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int) -> List[Document]:
+    """
+    Merge ranked lists: each document scores sum(1 / (RRF_K + rank)).
+    """
+    scores: Dict[str, float] = {}
+    first_seen: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            first_seen.setdefault(key, doc)
+    best = sorted(scores, key=lambda key: scores[key], reverse=True)[:k]
+    return [first_seen[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 and/or vector retrieval over one store.
+    - "lexical": BM25 only, no query embedding
+    - "hybrid": both legs fused by reciprocal rank
+    """
+
+    index: Any
+    vector_retriever: Optional[BaseRetriever] = None
+    k: int = 5
+    mode: str = "hybrid"
+
+    def _lexical(self, query: str, k: int) -> List[Document]:
+        return [doc for doc, _ in self.index.search(query, k)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.mode == "lexical" or self.vector_retriever is None:
+            return self._lexical(query, self.k)
+        candidates = self.k * max(HYBRID_CANDIDATES, 1)
+        vector_docs = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion([self._lexical(query, candidates), vector_docs], self.k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: Any) -> List[Document]:
+        if self.mode == "lexical" or self.vector_retriever is None:
+            return await asyncio.to_thread(self._lexical, query, self.k)
+        candidates = self.k * max(HYBRID_CANDIDATES, 1)
+        lexical_docs, vector_docs = await asyncio.gather(
+            asyncio.to_thread(self._lexical, query, candidates),
+            self.vector_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()}),
+        )
+        return reciprocal_rank_fusion([lexical_docs, vector_docs], self.k)
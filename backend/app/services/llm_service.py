@@ -1,92 +1,333 @@
 # backend/app/services/llm_service.py
+import asyncio
 import os
-from typing import List, Optional, Callable, Dict, Any, cast
+import re
+import threading
+import time
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple, cast
 
 from dotenv import load_dotenv
 
-from langchain.chains import ConversationalRetrievalChain
-from langchain.chains.summarize import load_summarize_chain
-from langchain.memory import ConversationBufferMemory
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+from langchain.schema import BaseMessage, Document
 from langchain_groq import ChatGroq
 from pydantic import SecretStr
-from app.services.vector_service import get_vector_store
+from app.services.context_service import pack_context
+from app.services.deep_research_service import asummarize_documents
+from app.services.metrics_service import counter, observe_stage, record_llm_usage, timed
+from app.services.session_service import Turn
+from app.services.vector_service import RETRIEVAL_MODE, get_retriever
 
 load_dotenv()
 
+# Model used to rewrite follow-up questions; a small, fast one is enough
+# (e.g. llama-3.1-8b-instant). Defaults to GROQ_MODEL.
+CONDENSE_MODEL = os.getenv("CONDENSE_MODEL", "")
+# Skip the condense call for questions that read as self-contained
+CONDENSE_SKIP_SELF_CONTAINED = os.getenv("CONDENSE_SKIP_SELF_CONTAINED", "true").lower() in ("1", "true", "yes")
 
-def get_llm() -> ChatGroq:
+# Words that usually point back at earlier turns
+_FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "they", "them", "their", "theirs", "this", "that", "these",
+    "those", "he", "him", "his", "she", "her", "hers", "former", "latter",
+    "above", "previous", "earlier", "same", "else", "more", "further", "again",
+}
+# Openers of elliptical follow-ups ("and the second one?", "what about X?")
+_FOLLOW_UP_OPENERS = re.compile(
+    r"^(and|also|but|so|then|or|what about|how about|why not|why|how come|"
+    r"tell me more|more on|elaborate|explain( that| this| more)?|continue|go on)\b"
+)
+# Questions this short rarely stand on their own ("why?", "which one?")
+_MIN_SELF_CONTAINED_WORDS = 4
+
+DOCUMENTS_RETRIEVED = counter(
+    "rag_documents_retrieved_total", "Documents returned by retrieval", ("retrieval",)
+)
+
+
+# One client per (model, api key): ChatGroq holds its own HTTP connection pool
+_llm_clients: Dict[Tuple[str, str], ChatGroq] = {}
+_llm_clients_lock = threading.Lock()
+
+
+def get_llm(model: Optional[str] = None) -> ChatGroq:
     """
     Return a LangChain-compatible LLM client (Groq).
     Requires GROQ_API_KEY in environment or .env.
-    Optional: GROQ_MODEL to override the default model.
+    Optional: GROQ_MODEL to override the default model, or pass model.
+    Clients are shared across requests.
     """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key or not api_key.strip():
         raise ValueError("GROQ_API_KEY is not set. Add it to your environment or .env file.")
 
     api_key_str: str = cast(str, api_key)
-    model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    model = model or os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+
+    with _llm_clients_lock:
+        llm = _llm_clients.get((model, api_key_str))
+        if llm is None:
+            # ChatGroq expects api_key (string). Some wrappers accept SecretStr; using string is fine.
+            llm = _llm_clients[(model, api_key_str)] = ChatGroq(
+                model=model,
+                temperature=0,
+                api_key=SecretStr(api_key_str)
+            )
+        return llm
+
+
+def get_condense_llm() -> ChatGroq:
+    """
+    LLM used to condense follow-up questions (CONDENSE_MODEL, else GROQ_MODEL).
+    """
+    return get_llm(CONDENSE_MODEL or None)
+
+
+def is_self_contained(question: str) -> bool:
+    """
+    Cheap local check for questions that can be answered without the chat
+    history: long enough, no back-references ("it", "that", "the latter")
+    and not opening like a follow-up ("and ...", "what about ...").
+    """
+    text = question.strip().lower()
+    words = re.findall(r"[a-z0-9']+", text)
+    if len(words) < _MIN_SELF_CONTAINED_WORDS:
+        return False
+    if _FOLLOW_UP_OPENERS.match(text):
+        return False
+    return not any(word in _FOLLOW_UP_WORDS for word in words)
+
+
+def condense_path(question: str, history: List[Turn]) -> str:
+    """
+    How a question is turned into a retrieval query:
+    "no_history", "self_contained" (both skip the LLM) or "condensed".
+    """
+    if not history:
+        return "no_history"
+    if CONDENSE_SKIP_SELF_CONTAINED and is_self_contained(question):
+        return "self_contained"
+    return "condensed"
+
+
+def format_sources(docs: List[Document]) -> List[str]:
+    """
+    Unique "source Page n" / "source Slide n" labels, in retrieval order.
+    """
+    sources: List[str] = []
+    for doc in docs:
+        source = doc.metadata.get("source", "unknown")
+        page = doc.metadata.get("page")
+        slide = doc.metadata.get("slide")
+        loc = f"Page {page}" if page else (f"Slide {slide}" if slide else "")
+        src_str = f"{source} {loc}".strip()
+        if src_str and src_str not in sources:
+            sources.append(src_str)
+    return sources
 
-    # ChatGroq expects api_key (string). Some wrappers accept SecretStr; using string is fine.
-    return ChatGroq(
-        model=model,
-        temperature=0,
-        api_key=SecretStr(api_key_str)
+
+def format_chat_history(turns: List[Turn]) -> str:
+    """
+    Render (question, answer) turns the way ConversationalRetrievalChain does
+    for its condense prompt.
+    """
+    return "".join(
+        (f"\nHuman: {question}" if question else "") + (f"\nAssistant: {answer}" if answer else "")
+        for question, answer in turns
     )
 
 
-def get_rag_chain(
-    memory: ConversationBufferMemory,
+async def acondense_question(llm: ChatGroq, question: str, chat_history: str) -> str:
+    """
+    Rewrite a follow-up question into a standalone one using the chat history.
+    """
+    prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=chat_history, question=question)
+    result = await llm.ainvoke(prompt)
+    record_llm_usage("condense", getattr(result, "usage_metadata", None))
+    return getattr(result, "content", str(result)).strip() or question
+
+
+def build_qa_messages(llm: ChatGroq, question: str, docs: List[Document]) -> List[BaseMessage]:
+    """
+    Same "stuff" prompt ConversationalRetrievalChain sends to the LLM.
+    """
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return PROMPT_SELECTOR.get_prompt(llm).format_messages(context=context, question=question)
+
+
+def build_deep_research_prompt(summary: str, query: str) -> str:
+    return f"You are an expert assistant. Use this summary to answer:\n\n{summary}\n\nQuestion: {query}\nAnswer:"
+
+
+async def _astream_tokens(llm: ChatGroq, prompt: Any, call: str = "answer") -> AsyncIterator[str]:
+    """
+    Stream the LLM's tokens, recording time to first token, total time and
+    token usage (reported on the last chunk) as the "llm_<call>" stages.
+    """
+    started = time.perf_counter()
+    first_token = True
+    usage: Optional[Dict[str, Any]] = None
+    try:
+        async for chunk in llm.astream(prompt):
+            if getattr(chunk, "usage_metadata", None):
+                usage = chunk.usage_metadata
+            token = getattr(chunk, "content", str(chunk))
+            if token:
+                if first_token:
+                    first_token = False
+                    observe_stage(f"llm_{call}_first_token", time.perf_counter() - started)
+                yield token
+    finally:
+        observe_stage(f"llm_{call}", time.perf_counter() - started)
+        record_llm_usage(call, usage)
+
+
+async def _aretrieve(query: str, k: int, store_path: Optional[str], retrieval: Optional[str]) -> List[Document]:
+    with timed("retrieve"):
+        # A cold store loads the embedding model, Chroma and the BM25 index
+        retriever = await asyncio.to_thread(get_retriever, k=k, store_path=store_path, mode=retrieval)
+        docs = await retriever.ainvoke(query)
+    DOCUMENTS_RETRIEVED.inc(len(docs), retrieval=retrieval or RETRIEVAL_MODE)
+    return docs
+
+
+async def _apack(docs: List[Document], budget: Optional[int] = None) -> Tuple[List[Document], Dict[str, Any]]:
+    with timed("pack"):
+        return await asyncio.to_thread(pack_context, docs, budget)
+
+
+async def _ainvoke(llm: ChatGroq, prompt: Any, call: str) -> str:
+    with timed(f"llm_{call}"):
+        result = await llm.ainvoke(prompt)
+    record_llm_usage(call, getattr(result, "usage_metadata", None))
+    return getattr(result, "content", str(result))
+
+
+async def _aprepare_rag(
+    question: str,
+    history: List[Turn],
+    k: int,
+    store_path: Optional[str],
+    retrieval: Optional[str] = None
+) -> Tuple[str, List[Document], Dict[str, Any]]:
+    """
+    Condense the question (only when it needs the history) and retrieve its
+    context. Also returns which condense path was taken.
+    """
+    path = condense_path(question, history)
+    condense: Dict[str, Any] = {"path": path}
+    standalone = question
+    if path == "condensed":
+        condense_llm = get_condense_llm()
+        condense["model"] = getattr(condense_llm, "model_name", None)
+        started = time.perf_counter()
+        standalone = await acondense_question(condense_llm, question, format_chat_history(history))
+        seconds = time.perf_counter() - started
+        observe_stage("llm_condense", seconds)
+        condense["seconds"] = round(seconds, 3)
+    docs = await _aretrieve(standalone, k, store_path, retrieval)
+    return standalone, docs, condense
+
+
+async def arun_rag(
+    question: str,
+    history: List[Turn],
     k: int = 5,
-    store_path: Optional[str] = None
-) -> ConversationalRetrievalChain:
-    """
-    Build a conversational retrieval chain using the LLM, retriever and memory.
-    NOTE: We intentionally avoid using ChatPromptTemplate + MessagesPlaceholder here
-    to prevent type-mismatch issues with chat_history variable injection.
-    """
-    vectordb = get_vector_store(store_path) if store_path else get_vector_store()
-    retriever = vectordb.as_retriever(search_kwargs={"k": k})
-
-    # Let the default combine / prompt behavior run; the memory will be attached to the chain.
-    rag_chain = ConversationalRetrievalChain.from_llm(
-        llm=get_llm(),
-        retriever=retriever,
-        memory=memory,
-        return_source_documents=True,
-        output_key="answer",
-    )
-    return rag_chain
+    store_path: Optional[str] = None,
+    retrieval: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Conversational RAG: condense against the (windowed) session history,
+    retrieve and answer. Saving the turn is up
+    to the caller. Blocking work (opening the store, searching it, packing
+    the context) runs in worker threads.
+    """
+    llm = get_llm()
+    standalone, docs, condense = await _aprepare_rag(question, history, k, store_path, retrieval)
+    docs, context = await _apack(docs)
+    with timed("prompt"):
+        messages = build_qa_messages(llm, standalone, docs)
+    answer = await _ainvoke(llm, messages, "answer")
+    with timed("assemble"):
+        return {"answer": answer, "sources": format_sources(docs), "condense": condense, "context": context}
 
 
-def get_deep_research_chain(k: int = 10, store_path: Optional[str] = None) -> Callable[[str], Dict[str, Any]]:
+async def arun_deep_research(
+    query: str,
+    k: int = 10,
+    store_path: Optional[str] = None,
+    retrieval: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Returns a function that performs deep research (retrieve -> summarize -> answer).
+    Deep research: retrieve, map-reduce summarise the passages (concurrent,
+    cached map phase, see deep_research_service) and answer from the summary.
+    Near-duplicate passages are dropped before the map phase; the token
+    budget does not apply, each passage is summarized on its own.
     """
-    vectordb = get_vector_store(store_path) if store_path else get_vector_store()
-    retriever = vectordb.as_retriever(search_kwargs={"k": k})
     llm = get_llm()
-    summarize_chain = load_summarize_chain(llm, chain_type="map_reduce", return_intermediate_steps=False)
-
-    def deep_research(query: str) -> Dict[str, Any]:
-        docs = retriever.get_relevant_documents(query)
-        summary_result = summarize_chain.run(docs)
-
-        prompt = f"You are an expert assistant. Use this summary to answer:\n\n{summary_result}\n\nQuestion: {query}\nAnswer:"
-        # ChatGroq may return an object; try to get content attribute or string
-        answer = llm.invoke(prompt)
-        answer_text = getattr(answer, "content", str(answer))
-
-        sources: List[str] = []
-        for doc in docs:
-            source = doc.metadata.get("source", "unknown")
-            page = doc.metadata.get("page")
-            slide = doc.metadata.get("slide")
-            loc = f"Page {page}" if page else (f"Slide {slide}" if slide else "")
-            src_str = f"{source} {loc}".strip()
-            if src_str and src_str not in sources:
-                sources.append(src_str)
-
-        return {"answer": answer_text, "sources": sources}
-
-    return deep_research
+    docs = await _aretrieve(query, k, store_path, retrieval)
+    docs, context = await _apack(docs, budget=0)
+    summary, map_stats = await asummarize_documents(llm, docs)
+    answer = await _ainvoke(llm, build_deep_research_prompt(summary, query), "answer")
+    with timed("assemble"):
+        return {"answer": answer, "sources": format_sources(docs), "map_phase": map_stats, "context": context}
+
+
+async def astream_rag_answer(
+    question: str,
+    history: List[Turn],
+    k: int = 5,
+    store_path: Optional[str] = None,
+    retrieval: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of the RAG chain. Yields events:
+    - {"event": "condense", "data": {"path": ...}} with the condense path taken
+    - {"event": "sources", "data": {"sources": [...]}} once retrieval is done
+    - {"event": "context", "data": {...}} with the packed context's token counts
+    - {"event": "token", "data": {"token": "..."}} for each LLM token
+    - {"event": "done", "data": {"answer": "..."}} with the full answer
+    """
+    llm = get_llm()
+    standalone, docs, condense = await _aprepare_rag(question, history, k, store_path, retrieval)
+    docs, context = await _apack(docs)
+    yield {"event": "condense", "data": condense}
+    yield {"event": "sources", "data": {"sources": format_sources(docs)}}
+    yield {"event": "context", "data": context}
+
+    with timed("prompt"):
+        messages = build_qa_messages(llm, standalone, docs)
+    parts: List[str] = []
+    async for token in _astream_tokens(llm, messages):
+        parts.append(token)
+        yield {"event": "token", "data": {"token": token}}
+
+    yield {"event": "done", "data": {"answer": "".join(parts)}}
+
+
+async def astream_deep_research(
+    query: str,
+    k: int = 10,
+    store_path: Optional[str] = None,
+    retrieval: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of deep research: sources and context first, then
+    map-phase counters and the final answer's tokens once the summary is
+    ready.
+    """
+    llm = get_llm()
+    docs = await _aretrieve(query, k, store_path, retrieval)
+    docs, context = await _apack(docs, budget=0)
+    yield {"event": "sources", "data": {"sources": format_sources(docs)}}
+    yield {"event": "context", "data": context}
+
+    summary, map_stats = await asummarize_documents(llm, docs)
+    yield {"event": "map_phase", "data": map_stats}
+
+    parts: List[str] = []
+    async for token in _astream_tokens(llm, build_deep_research_prompt(summary, query)):
+        parts.append(token)
+        yield {"event": "token", "data": {"token": token}}
+    yield {"event": "done", "data": {"answer": "".join(parts)}}
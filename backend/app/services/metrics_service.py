@@ -0,0 +1,297 @@
+# backend/app/services/metrics_service.py
+# Stdlib only: imported by main.py before the heavy dependencies load.
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Add a Server-Timing header (per-stage breakdown) to API responses
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds, from a cached lookup to a slow deep-research call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+T = TypeVar("T")
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter, one series per label-value tuple.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labels, key)} {_number(v)}" for key, v in values]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus semantics), one series per
+    label-value tuple.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Count and total per series, keyed by the comma-joined label values.
+        """
+        with self._lock:
+            return {
+                ",".join(key): {"count": s[2], "seconds": round(s[1], 6)}
+                for key, s in sorted(self._series.items())
+            }
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines: List[str] = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {count}")
+        return lines
+
+
+_metrics: Dict[str, Any] = {}
+_collectors: List[Tuple[str, Callable[[], Dict[str, Any]], Tuple[str, ...], Optional[str]]] = []
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    """
+    Get or create a registered counter.
+    """
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = Counter(name, help, labels)
+        return metric
+
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Get or create a registered histogram.
+    """
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = Histogram(name, help, labels, buckets)
+        return metric
+
+
+def register_stats(
+    prefix: str,
+    collect: Callable[[], Dict[str, Any]],
+    counters: Sequence[str] = (),
+    label: Optional[str] = None
+) -> None:
+    """
+    Export an existing stats() dict at scrape time: each numeric key becomes
+    {prefix}_{key} (keys listed in counters as {prefix}_{key}_total, the
+    rest as gauges). With label, collect() returns {label value: stats}.
+    """
+    with _registry_lock:
+        _collectors.append((prefix, collect, tuple(counters), label))
+
+
+# --- Stage timing --------------------------------------------------------
+
+STAGE_SECONDS = histogram(
+    "rag_stage_seconds", "Time spent in each ingestion / chat stage", ("stage",)
+)
+
+# stage -> [seconds, calls] for the request being served (see request_timings)
+_request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """
+    Record one stage duration in the histogram and in the current request's
+    timing breakdown, if any.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+class TimedIterator(Iterator[T]):
+    """
+    Accumulates the time spent producing items of a lazy stream, so stages
+    that interleave (extraction feeding chunking) can be measured apart.
+    """
+
+    def __init__(self, items: Iterable[T]):
+        self.items = iter(items)
+        self.seconds = 0.0
+
+    def __iter__(self) -> "TimedIterator[T]":
+        return self
+
+    def __next__(self) -> T:
+        started = time.perf_counter()
+        try:
+            return next(self.items)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+@contextmanager
+def request_timings() -> Iterator[Dict[str, List[float]]]:
+    """
+    Collect observe_stage calls made while serving one request, including
+    those made in threads started with asyncio.to_thread / run_in_threadpool
+    (they copy the context).
+    """
+    timings: Dict[str, List[float]] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings: Dict[str, List[float]], total: Optional[float] = None) -> str:
+    """
+    Format a breakdown as a Server-Timing header value (durations in ms).
+    Stages run several times (e.g. concurrent map calls) report their summed
+    time and the number of calls.
+    """
+    parts = []
+    for stage, (seconds, calls) in timings.items():
+        desc = f';desc="{int(calls)} calls"' if calls > 1 else ""
+        parts.append(f"{stage};dur={seconds * 1000:.1f}{desc}")
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+LLM_CALLS = counter("rag_llm_calls_total", "LLM calls by purpose", ("call",))
+LLM_TOKENS = counter("rag_llm_tokens_total", "LLM tokens by purpose and direction", ("call", "direction"))
+
+
+def record_llm_usage(call: str, usage: Optional[Dict[str, Any]]) -> None:
+    """
+    Count one LLM call and the tokens it reports (AIMessage.usage_metadata;
+    providers that report nothing only add to the call count).
+    """
+    LLM_CALLS.inc(call=call)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0) or 0, call=call, direction="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0) or 0, call=call, direction="output")
+
+
+# --- Exposition ----------------------------------------------------------
+
+def _render_stats(prefix: str, collect: Callable[[], Dict[str, Any]], counters: Tuple[str, ...], label: Optional[str]) -> List[str]:
+    try:
+        stats = collect() or {}
+    except Exception as e:
+        logger.warning("Metrics collector '%s' failed: %s", prefix, e)
+        return []
+    groups = stats.items() if label else [(None, stats)]
+    series: Dict[str, List[str]] = {}
+    for label_value, values in groups:
+        labels = _label_str((label,), (label_value,)) if label else ""
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{key}_total" if key in counters else f"{prefix}_{key}"
+            series.setdefault(name, []).append(f"{name}{labels} {_number(value)}")
+    lines: List[str] = []
+    for name, samples in series.items():
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# TYPE {name} {kind}"] + samples
+    return lines
+
+
+def render_prometheus() -> str:
+    """
+    All registered metrics in the Prometheus text exposition format.
+    """
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    for prefix, collect, counters, label in collectors:
+        lines.extend(_render_stats(prefix, collect, counters, label))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,537 @@
+# backend/app/services/numpy_store.py
+from __future__ import annotations
+
+import json
+import operator
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer
+    fcntl = None
+
+# Raw float32 rows (memory-mapped on load), one [id, text, metadata] JSON
+# line per row, the numbers of deleted rows (uint32), and a small header
+# recording how much of each file is committed. All but the header are
+# append-only between compactions.
+VECTORS_NAME = "vectors.f32"
+ROWS_NAME = "vectors.jsonl"
+TOMBSTONES_NAME = "vectors.dead"
+HEADER_NAME = "vectors.meta.json"
+# Held (flock) by whichever process is writing the files
+LOCK_NAME = "vectors.lock"
+# Single-file sidecar written by earlier versions; migrated on open
+LEGACY_SIDECAR_NAME = "vectors.json"
+
+# Rewrite the vector file once this share of its rows are deleted/overwritten
+NUMPY_STORE_COMPACT_RATIO = float(os.getenv("NUMPY_STORE_COMPACT_RATIO", "0.25"))
+
+
+def _replace_file(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _append_file(path: Path, size: int, data: bytes) -> None:
+    """
+    Cut path to size bytes (its committed length), then append data.
+    """
+    with open(path, "ab") as f:
+        f.truncate(size)
+        if data:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+_WHERE_OPERATORS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+
+def _matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """
+    Whether metadata satisfies a Chroma-style where filter.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op not in _WHERE_OPERATORS:
+                    raise ValueError(f"Unsupported where operator '{op}'")
+                if not _WHERE_OPERATORS[op](metadata[key], operand):
+                    return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Flat (exact) cosine-similarity index over a float32 matrix.
+    - Persisted rows are memory-mapped read-only, so opening a store costs
+      one read of the row file and no copy of the vectors.
+    - Rows added since the last persist live in an in-memory tail; persist
+      appends them (and new tombstones), so its cost follows the change,
+      not the store size. Other processes read just the appended part.
+    - Deletes and upserts tombstone rows; the files are compacted once
+      NUMPY_STORE_COMPACT_RATIO of the rows are dead.
+    - Several processes may write the same store: persist takes a file
+      lock and, if another process committed in the meantime, reloads its
+      state and replays this handle's unsaved changes on top before writing.
+    Mirrors the parts of the Chroma API the services use (persist, get,
+    delete_collection), so the two are interchangeable behind vector_service.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings):
+        self.persist_directory = persist_directory
+        self._embedding = embedding_function
+        directory = Path(persist_directory)
+        self._vectors_path = directory / VECTORS_NAME
+        self._rows_path = directory / ROWS_NAME
+        self._tombstones_path = directory / TOMBSTONES_NAME
+        self._header_path = directory / HEADER_NAME
+        self._lock_path = directory / LOCK_NAME
+        self._legacy_path = directory / LEGACY_SIDECAR_NAME
+        self._lock = threading.RLock()
+        with self._file_lock():
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # --- storage -------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """
+        Exclusive lock on the store files across processes.
+        """
+        Path(self.persist_directory).mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _header_mtime(self) -> Optional[float]:
+        try:
+            return self._header_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def _read_header(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._header_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> None:
+        self._dim = 0
+        self._stored = np.zeros((0, 0), dtype=np.float32)
+        self._tail: List[np.ndarray] = []
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._alive: List[bool] = []
+        self._rows: Dict[str, int] = {}
+        # Rows deleted since the last persist
+        self._killed: List[int] = []
+        # Committed extent of each file (see HEADER_NAME)
+        self._persisted_rows = 0
+        self._row_bytes = 0
+        self._dead_count = 0
+        self._generation = 0
+        self._dirty = False
+        self._mtime = self._header_mtime()
+        header = self._read_header()
+        if header is None:
+            if self._legacy_path.exists():
+                self._migrate_legacy()
+            return
+
+        self._dim = header["dim"]
+        self._generation = header["generation"]
+        self._read_appended(header)
+        self._remap()
+
+    def _read_appended(self, header: Dict[str, Any]) -> List[int]:
+        """
+        Read the rows and tombstones committed after the ones already known.
+        Returns the newly deleted rows.
+        """
+        with open(self._rows_path, "rb") as f:
+            f.seek(self._row_bytes)
+            data = f.read(header["row_bytes"] - self._row_bytes)
+        for line in data.splitlines():
+            doc_id, text, metadata = json.loads(line)
+            self._ids.append(doc_id)
+            self._texts.append(text)
+            self._metadatas.append(metadata)
+            self._alive.append(True)
+        dead = np.fromfile(
+            self._tombstones_path, dtype="<u4",
+            count=header["dead"] - self._dead_count, offset=self._dead_count * 4
+        ) if header["dead"] > self._dead_count else []
+        killed = [int(row) for row in dead]
+        for row in killed:
+            self._alive[row] = False
+        self._persisted_rows = header["rows"]
+        self._row_bytes = header["row_bytes"]
+        self._dead_count = header["dead"]
+        return killed
+
+    def _migrate_legacy(self) -> None:
+        with open(self._legacy_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self._dim = sidecar["dim"]
+        self._ids = sidecar["ids"]
+        self._texts = sidecar["texts"]
+        self._metadatas = sidecar["metadatas"]
+        self._alive = sidecar["alive"]
+        self._persisted_rows = len(self._ids)
+        self._rewrite_rows()
+        self._write_header()
+        self._legacy_path.unlink()
+        self._mtime = self._header_mtime()
+        self._remap()
+
+    def _remap(self) -> None:
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if self._alive[row]}
+        self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        # Map the persisted rows; no vector data is read until it is searched
+        self._tail = []
+        self._stored = np.zeros((0, self._dim), dtype=np.float32)
+        if self._persisted_rows:
+            self._stored = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(self._persisted_rows, self._dim)
+            )
+
+    def refresh(self) -> None:
+        """
+        Pick up what another process persisted: only the appended rows and
+        tombstones are read, unless the store was compacted or reset in the
+        meantime. A handle with unsaved changes catches up when it persists.
+        """
+        with self._lock:
+            if self._dirty or self._header_mtime() == self._mtime:
+                return
+            with self._file_lock():
+                self._refresh()
+
+    def _refresh(self) -> None:
+        mtime = self._header_mtime()
+        header = self._read_header()
+        if (
+            header is None
+            or header["generation"] != self._generation
+            or header["rows"] < self._persisted_rows
+            or header["dead"] < self._dead_count
+        ):
+            self._load()
+            return
+        known = len(self._ids)
+        self._dim = header["dim"]
+        killed = self._read_appended(header)
+        for row in range(known, len(self._ids)):
+            self._rows[self._ids[row]] = row
+        for row in killed:
+            if self._rows.get(self._ids[row]) == row:
+                del self._rows[self._ids[row]]
+        self._map_vectors()
+        self._mtime = mtime
+
+    def _tail_matrix(self) -> Optional[np.ndarray]:
+        if not self._tail:
+            return None
+        if len(self._tail) > 1:
+            self._tail = [np.vstack(self._tail)]
+        return self._tail[0]
+
+    def _row_line(self, row: int) -> bytes:
+        line = json.dumps([self._ids[row], self._texts[row], self._metadatas[row]], ensure_ascii=False, separators=(",", ":"))
+        return (line + "\n").encode("utf-8")
+
+    def _rewrite_rows(self) -> None:
+        """
+        Write the row and tombstone files afresh from memory.
+        """
+        rows = b"".join(self._row_line(row) for row in range(len(self._ids)))
+        dead = np.asarray([row for row, alive in enumerate(self._alive) if not alive], dtype="<u4")
+        _replace_file(self._rows_path, rows)
+        _replace_file(self._tombstones_path, dead.tobytes())
+        self._row_bytes = len(rows)
+        self._dead_count = len(dead)
+
+    def _write_header(self) -> None:
+        header = {
+            "dim": self._dim,
+            "rows": self._persisted_rows,
+            "row_bytes": self._row_bytes,
+            "dead": self._dead_count,
+            "generation": self._generation,
+        }
+        _replace_file(self._header_path, json.dumps(header).encode("utf-8"))
+
+    def persist(self) -> None:
+        """
+        Append the in-memory tail and new tombstones (or compact), then
+        commit them by rewriting the small header.
+        """
+        with self._lock, self._file_lock():
+            if not self._dirty:
+                return
+            if self._committed_elsewhere():
+                self._replay_on_committed()
+            dead = self._alive.count(False)
+            if self._ids and dead / len(self._ids) >= NUMPY_STORE_COMPACT_RATIO:
+                self._compact()
+            else:
+                # Each append first drops bytes a crash may have left past the
+                # committed extent
+                vectors = b"".join(np.ascontiguousarray(block, dtype=np.float32).tobytes() for block in self._tail)
+                _append_file(self._vectors_path, self._persisted_rows * self._dim * 4, vectors)
+                rows = b"".join(self._row_line(row) for row in range(self._persisted_rows, len(self._ids)))
+                _append_file(self._rows_path, self._row_bytes, rows)
+                _append_file(self._tombstones_path, self._dead_count * 4, np.asarray(self._killed, dtype="<u4").tobytes())
+                self._persisted_rows = len(self._ids)
+                self._row_bytes += len(rows)
+                self._dead_count += len(self._killed)
+            self._killed = []
+            self._write_header()
+            self._map_vectors()
+            self._dirty = False
+            self._mtime = self._header_mtime()
+
+    def _committed_elsewhere(self) -> bool:
+        header = self._read_header()
+        committed = (
+            (header["rows"], header["row_bytes"], header["dead"], header["generation"]) if header else (0, 0, 0, 0)
+        )
+        return committed != (self._persisted_rows, self._row_bytes, self._dead_count, self._generation)
+
+    def _replay_on_committed(self) -> None:
+        """
+        Reload what another process committed, then redo this handle's
+        unsaved deletes and additions on top of it.
+        """
+        deleted = [self._ids[row] for row in self._killed if row < self._persisted_rows]
+        added = [row for row in range(self._persisted_rows, len(self._ids)) if self._alive[row]]
+        tail = self._tail_matrix()
+        vectors = tail[[row - self._persisted_rows for row in added]] if added else None
+        rows = [(self._ids[row], self._texts[row], self._metadatas[row]) for row in added]
+        self._load()
+        self._delete_ids(deleted)
+        if vectors is not None:
+            self._append_rows(rows, vectors)
+
+    def _compact(self) -> None:
+        keep = [row for row, alive in enumerate(self._alive) if alive]
+        tail = self._tail_matrix()
+        matrix = self._stored if tail is None else (np.vstack([self._stored, tail]) if len(self._stored) else tail)
+        matrix = matrix[keep] if keep else np.zeros((0, self._dim), dtype=np.float32)
+        _replace_file(self._vectors_path, np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+        self._ids = [self._ids[row] for row in keep]
+        self._texts = [self._texts[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._alive = [True] * len(keep)
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._persisted_rows = len(keep)
+        self._generation += 1
+        self._rewrite_rows()
+
+    def delete_collection(self) -> None:
+        with self._lock, self._file_lock():
+            for path in (
+                self._vectors_path, self._rows_path, self._tombstones_path, self._header_path, self._legacy_path
+            ):
+                if path.exists():
+                    path.unlink()
+            self._load()
+
+    # --- VectorStore API ----------------------------------------------
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self._normalise(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+
+        with self._lock:
+            self._append_rows(list(zip(ids, texts, metadatas)), vectors)
+        return ids
+
+    def _append_rows(self, rows: List[Tuple[str, str, Optional[dict]]], vectors: np.ndarray) -> None:
+        if not self._dim:
+            self._dim = vectors.shape[1]
+        elif vectors.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store ({self._dim})")
+
+        for doc_id, text, metadata in rows:
+            old = self._rows.get(doc_id)
+            if old is not None:
+                self._alive[old] = False
+                self._killed.append(old)
+            self._rows[doc_id] = len(self._ids)
+            self._ids.append(doc_id)
+            self._texts.append(text)
+            self._metadatas.append(dict(metadata or {}))
+            self._alive.append(True)
+        self._tail.append(vectors)
+        self._dirty = True
+
+    def _delete_ids(self, ids: Iterable[str]) -> None:
+        for doc_id in ids:
+            row = self._rows.pop(doc_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._killed.append(row)
+                self._dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            self._delete_ids(ids or [])
+        return True
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> Dict[str, Any]:
+        """
+        Live ids, texts and metadata, shaped like Chroma's get(): rows
+        filtered by ids and/or a where filter on metadata ($eq, $ne, $gt,
+        $gte, $lt, $lte, $in, $nin, $and, $or), then paged by offset/limit.
+        """
+        if kwargs:
+            raise TypeError(f"NumpyVectorStore.get() got unsupported arguments: {', '.join(sorted(kwargs))}")
+        with self._lock:
+            if ids is None:
+                rows = [row for row, alive in enumerate(self._alive) if alive]
+            else:
+                rows = [self._rows[doc_id] for doc_id in dict.fromkeys(ids) if doc_id in self._rows]
+            if where:
+                rows = [row for row in rows if _matches(self._metadatas[row], where)]
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._texts[row] for row in rows],
+                "metadatas": [self._metadatas[row] for row in rows],
+            }
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vectors([embedding], k)[0]
+
+    def similarity_search_with_score_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Top-k for several query vectors with one matrix product per part.
+        """
+        self.refresh()
+        with self._lock:
+            if not self._rows or not embeddings:
+                return [[] for _ in embeddings]
+            stored, tail = self._stored, self._tail_matrix()
+            alive = np.asarray(self._alive, dtype=bool)
+            ids, texts, metadatas = self._ids, self._texts, self._metadatas
+
+        # Score the mapped rows in place; only the unsaved tail is separate
+        queries = self._normalise(np.asarray(embeddings, dtype=np.float32))
+        parts = [queries @ m.T for m in (stored, tail) if m is not None and len(m)]
+        scores = np.concatenate(parts, axis=1) if len(parts) > 1 else parts[0].copy()
+        scores[:, ~alive] = -np.inf
+        k = min(k, int(alive.sum()))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-row_scores[candidates])]
+            results.append([
+                (Document(id=ids[row], page_content=texts[row], metadata=dict(metadatas[row])), float(row_scores[row]))
+                for row in candidates
+            ])
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        if not persist_directory:
+            raise ValueError("persist_directory is required")
+        store = cls(persist_directory, embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        store.persist()
+        return store
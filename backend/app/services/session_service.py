@@ -0,0 +1,210 @@
+# backend/app/services/session_service.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.chunking_service import count_tokens
+
+BASE_DIR = Path(__file__).resolve().parents[2]  # backend/
+
+# "memory" (per process) or "sqlite" (survives restarts, shared by workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", str(BASE_DIR / "sessions.sqlite3"))
+# Idle sessions are dropped after this many seconds
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+# Turns kept per session; older ones are discarded
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "50"))
+# Token budget of the history handed to the question-condensing prompt
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1500"))
+
+Turn = Tuple[str, str]  # (question, answer)
+
+
+def merge_turns(stored: List[Turn], incoming: List[Turn]) -> List[Turn]:
+    """
+    Append only the turns of incoming that stored does not already end with.
+    Clients replay their (windowed) history on every request, so the
+    incoming list usually overlaps the tail of what is stored.
+    """
+    max_overlap = min(len(stored), len(incoming))
+    for overlap in range(max_overlap, 0, -1):
+        if stored[-overlap:] == incoming[:overlap]:
+            return stored + incoming[overlap:]
+    # Client history already contained in what is stored (e.g. a shorter window)
+    if incoming and any(stored[i:i + len(incoming)] == incoming for i in range(len(stored))):
+        return stored
+    return stored + incoming
+
+
+def window_turns(turns: List[Turn], max_tokens: Optional[int] = None) -> List[Turn]:
+    """
+    Most recent turns that fit in max_tokens (always at least the last one).
+    """
+    budget = SESSION_HISTORY_TOKENS if max_tokens is None else max_tokens
+    window: List[Turn] = []
+    used = 0
+    for question, answer in reversed(turns):
+        tokens = count_tokens(question) + count_tokens(answer)
+        if window and used + tokens > budget:
+            break
+        window.append((question, answer))
+        used += tokens
+    return list(reversed(window))
+
+
+class MemorySessionStore:
+    """
+    In-process session store with LRU and idle-TTL eviction.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Tuple[List[Turn], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            oldest_id, (_, touched) = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - touched > self.ttl:
+                self._sessions.pop(oldest_id)
+            else:
+                break
+
+    def load(self, session_id: str, incoming: Optional[List[Turn]] = None) -> List[Turn]:
+        now = time.time()
+        with self._lock:
+            turns, touched = self._sessions.pop(session_id, ([], now))
+            if now - touched > self.ttl:
+                turns = []
+            if incoming:
+                turns = merge_turns(turns, incoming)[-SESSION_MAX_TURNS:]
+            self._sessions[session_id] = (turns, now)
+            self._evict(now)
+            return list(turns)
+
+    def append(self, session_id: str, turn: Turn) -> None:
+        now = time.time()
+        with self._lock:
+            turns, _ = self._sessions.pop(session_id, ([], now))
+            turns = (turns + [turn])[-SESSION_MAX_TURNS:]
+            self._sessions[session_id] = (turns, now)
+            self._evict(now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Session store in SQLite, so sessions survive restarts and are shared by
+    every uvicorn worker on the host.
+    """
+
+    def __init__(self, path: str, max_sessions: int = SESSION_MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                turns TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)")
+        self._conn.commit()
+
+    def _read(self, session_id: str, now: float) -> List[Turn]:
+        row = self._conn.execute(
+            "SELECT turns, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            return []
+        return [(q, a) for q, a in json.loads(row[0])]
+
+    def _write(self, session_id: str, turns: List[Turn], now: float) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, turns, updated_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(turns[-SESSION_MAX_TURNS:]), now),
+        )
+        self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def load(self, session_id: str, incoming: Optional[List[Turn]] = None) -> List[Turn]:
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE: take the write lock up front so workers don't interleave merges
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                turns = self._read(session_id, now)
+                if incoming:
+                    turns = merge_turns(turns, incoming)[-SESSION_MAX_TURNS:]
+                self._write(session_id, turns, now)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            return turns
+
+    def append(self, session_id: str, turn: Turn) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                turns = self._read(session_id, now) + [turn]
+                self._write(session_id, turns, now)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "sessions": self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """
+    The configured session store (SESSION_BACKEND), created on first use.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if SESSION_BACKEND == "sqlite":
+                _store = SQLiteSessionStore(SESSION_DB_PATH)
+            else:
+                _store = MemorySessionStore()
+        return _store
@@ -0,0 +1,240 @@
+# backend/app/services/singleflight_service.py
+import asyncio
+import copy
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.services.embedding_cache import normalize_text
+from app.services.metrics_service import register_stats
+from app.services.session_service import Turn
+
+# Identical concurrent chat requests share one retrieval + LLM computation
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+FlightKey = Tuple[Hashable, ...]
+
+
+def normalize_query(query: str) -> str:
+    return normalize_text(query).casefold()
+
+
+def history_fingerprint(turns: List[Turn]) -> str:
+    return hashlib.sha256(json.dumps(turns, ensure_ascii=False).encode("utf-8")).hexdigest() if turns else ""
+
+
+def flight_key(
+    store_path: str,
+    version: str,
+    mode: str,
+    retrieval: str,
+    k: int,
+    query: str,
+    history: List[Turn]
+) -> FlightKey:
+    """
+    Requests with equal keys get the same answer: same store contents,
+    pipeline, k, question and (when the question depends on it) history.
+    """
+    return (store_path, version, mode, retrieval, k, normalize_query(query), history_fingerprint(history))
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """
+    Events produced so far by one streamed computation; subscribers replay
+    them from the start and then follow along.
+    """
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self, seen: int) -> None:
+        changed = self._changed
+        if len(self.events) == seen and not self.done:
+            await changed.wait()
+
+
+class Subscription:
+    """
+    One caller's view of a shared event stream. close() (also run when
+    iteration ends) detaches it; the producer is cancelled once nobody is
+    left listening.
+    """
+
+    def __init__(self, flights: "SingleFlight", key: FlightKey, broadcast: _Broadcast):
+        self._flights = flights
+        self._key = key
+        self._broadcast = broadcast
+        self._seen = 0
+        self._closed = False
+        broadcast.subscribers += 1
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Any:
+        broadcast = self._broadcast
+        try:
+            while True:
+                if self._seen < len(broadcast.events):
+                    self._seen += 1
+                    return copy.deepcopy(broadcast.events[self._seen - 1])
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    raise StopAsyncIteration
+                await broadcast.wait(self._seen)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._flights._detach(self._key, self._broadcast)
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight async computations (one event loop).
+    - do(): awaitable results. The first caller starts the computation as
+      its own task; later callers with the same key await that task.
+    - join()/start(): the streaming counterpart, where every subscriber
+      replays the shared event stream from its first event.
+    The shared work is shielded from any single caller: a caller that
+    disconnects only detaches, and the work is cancelled when the last
+    caller is gone.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self._calls: Dict[FlightKey, _Flight] = {}
+        self._streams: Dict[FlightKey, _Broadcast] = {}
+
+    async def do(self, key: FlightKey, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run compute() once per key at a time. Returns (result, shared); each
+        caller gets its own copy of the result.
+        """
+        flight = self._calls.get(key)
+        shared = flight is not None
+        if flight is None:
+            self.leaders += 1
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(compute()))
+            flight.task.add_done_callback(lambda _, f=flight: self._forget_call(key, f))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self.cancelled += 1
+                flight.task.cancel()
+        return copy.deepcopy(result), shared
+
+    def _forget_call(self, key: FlightKey, flight: _Flight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # retrieved here so an unawaited failure is not logged
+
+    def join(self, key: FlightKey) -> Optional[Subscription]:
+        """
+        Subscribe to an in-flight stream for key, if there is one.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None or broadcast.done:
+            return None
+        self.coalesced += 1
+        return Subscription(self, key, broadcast)
+
+    def start(
+        self,
+        key: FlightKey,
+        events: Callable[[], AsyncIterator[Any]],
+        on_done: Optional[Callable[[], None]] = None
+    ) -> Subscription:
+        """
+        Start streaming events() for key and subscribe to it. If an identical
+        stream started in the meantime, join that one instead. on_done runs
+        once the producer finishes, fails or is cancelled (or right away
+        when joining).
+        """
+        joined = self.join(key)
+        if joined is not None:
+            if on_done is not None:
+                on_done()
+            return joined
+
+        self.leaders += 1
+        broadcast = self._streams[key] = _Broadcast()
+        subscription = Subscription(self, key, broadcast)
+        broadcast.task = asyncio.ensure_future(self._produce(broadcast, events))
+        # Done callbacks also run for a task cancelled before it ever started
+        broadcast.task.add_done_callback(lambda _: self._finish(key, broadcast))
+        if on_done is not None:
+            broadcast.task.add_done_callback(lambda _: on_done())
+        return subscription
+
+    @staticmethod
+    async def _produce(broadcast: _Broadcast, events: Callable[[], AsyncIterator[Any]]) -> None:
+        stream = events()
+        try:
+            async for event in stream:
+                broadcast.events.append(event)
+                broadcast.notify()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _finish(self, key: FlightKey, broadcast: _Broadcast) -> None:
+        if broadcast.task is not None and broadcast.task.cancelled() and broadcast.error is None:
+            broadcast.error = asyncio.CancelledError()
+        broadcast.done = True
+        broadcast.notify()
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+    def _detach(self, key: FlightKey, broadcast: _Broadcast) -> None:
+        broadcast.subscribers -= 1
+        if broadcast.subscribers == 0 and broadcast.task is not None and not broadcast.task.done():
+            self.cancelled += 1
+            broadcast.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": SINGLE_FLIGHT_ENABLED,
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
+
+
+single_flight = SingleFlight()
+register_stats("rag_single_flight", single_flight.stats, counters=("leaders", "coalesced", "cancelled"))
@@ -0,0 +1,124 @@
+# backend/app/services/startup_service.py
+# Keep this module light: it is imported before any heavy dependency.
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (module, API tag) of the routers loaded in the background at startup
+ROUTER_MODULES: List[Tuple[str, str]] = [
+    ("app.api.upload", "Document Upload"),
+    ("app.api.chat", "Chat"),
+    ("app.api.sources", "Sources"),
+    ("app.api.retrieve", "Retrieval"),
+]
+
+
+class StartupState:
+    """
+    Progress of the background boot: router imports, then warm-up steps.
+    phase is "starting", "importing", "warming", "ready" or "failed".
+    """
+
+    def __init__(self):
+        self.phase = "starting"
+        self.routes_ready = False
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.imports: Dict[str, float] = {}
+        self.warmup: Dict[str, Any] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._routes_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == "ready"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "ready": self.ready,
+            "error": self.error,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "boot_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "import_seconds": dict(self.imports),
+            "warmup": dict(self.warmup),
+        }
+
+
+state = StartupState()
+
+
+def load_routers(include: Callable[[Any, str], None]) -> None:
+    """
+    Import the API modules (the heavy part of startup) and hand each router
+    to include(router, tag). Runs once; later calls return immediately.
+    """
+    with state._routes_lock:
+        if state.routes_ready:
+            return
+        routers = []
+        for module_name, tag in ROUTER_MODULES:
+            started = time.perf_counter()
+            module = importlib.import_module(module_name)
+            state.imports[module_name] = round(time.perf_counter() - started, 3)
+            routers.append((module.router, tag))
+        for router, tag in routers:
+            include(router, tag)
+        state.routes_ready = True
+
+
+def _timed(name: str, step: Callable[[], Any]) -> None:
+    started = time.perf_counter()
+    try:
+        detail = step()
+        state.warmup[name] = {"seconds": round(time.perf_counter() - started, 3), "ok": True}
+        if isinstance(detail, dict):
+            state.warmup[name].update(detail)
+    except Exception as e:
+        # A failed warm-up only costs latency later: the step reruns lazily on first use
+        state.warmup[name] = {"seconds": round(time.perf_counter() - started, 3), "ok": False, "error": str(e)}
+        logger.warning("Warm-up step '%s' failed: %s", name, e)
+
+
+def _boot(include: Callable[[Any, str], None], warm_embeddings: bool) -> None:
+    try:
+        state.phase = "importing"
+        load_routers(include)
+
+        state.phase = "warming"
+        if warm_embeddings:
+            from app.services.embedding_service import warm_up
+            _timed("embedding_model", warm_up)
+
+        def warm_store() -> Dict[str, Any]:
+            from app.services.vector_service import get_lexical_store, get_vector_store
+            get_vector_store()
+            return get_lexical_store().stats()
+
+        _timed("default_store", warm_store)
+
+        state.ready_at = time.time()
+        state.phase = "ready"
+        logger.info("Startup complete in %.2fs: %s", state.ready_at - state.started_at, state.to_dict())
+    except Exception as e:
+        state.error = str(e)
+        state.phase = "failed"
+        logger.exception("Startup failed: %s", e)
+
+
+def start_background_boot(include: Callable[[Any, str], None], warm_embeddings: bool = True) -> None:
+    """
+    Import routers and warm caches in a daemon thread so the server can
+    answer liveness/readiness probes while it boots.
+    """
+    if state._thread is not None:
+        return
+    state._thread = threading.Thread(
+        target=_boot, args=(include, warm_embeddings), name="startup", daemon=True
+    )
+    state._thread.start()
@@ -3,18 +3,58 @@ from __future__ import annotations
 
 import os
 import shutil
+import threading
+import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 
 from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from langchain.schema import Document
 
-from app.services.embedding_service import get_embeddings_model
+from app.services.chunking_service import batched
+from app.services.embedding_cache import cache_namespace, embed_queries, with_embedding_cache
+from app.services.embedding_service import embedding_runtime, get_embeddings_model, with_query_batching
+from app.services.lexical_service import (
+    HYBRID_CANDIDATES,
+    BM25Index,
+    HybridRetriever,
+    drop_lexical_index,
+    get_lexical_index,
+    reciprocal_rank_fusion,
+)
+from app.services.metrics_service import counter, timed
+from app.services.numpy_store import NumpyVectorStore
 
 # Base: backend/
 BASE_DIR = Path(__file__).resolve().parents[2]
 DEFAULT_VECTOR_DIR = str(BASE_DIR / "chroma_store")
 
+# Number of chunks embedded and written per add call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Max number of open store handles kept across requests (LRU)
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", "8"))
+
+# "chroma" or "numpy" (memory-mapped flat index, see numpy_store)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+_store_cache: "OrderedDict[str, VectorStore]" = OrderedDict()
+_store_cache_lock = threading.RLock()
+# Per-path locks so concurrent first requests open a store only once
+_path_locks: Dict[str, threading.Lock] = {}
+
+# File inside each store whose content changes on every write or reset
+INDEX_VERSION_NAME = "index_version"
+
+# "hybrid" (BM25 + vector, fused), "vector" or "lexical" (BM25 only, no embedding)
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+
+INDEXED_CHUNKS = counter("rag_indexed_chunks_total", "Chunks written to vector stores")
+
 
 def resolve_path(store_path: Optional[str] = None) -> str:
     """
@@ -33,60 +73,317 @@ def resolve_path(store_path: Optional[str] = None) -> str:
     return str(abs_path)
 
 
+def _path_lock(abs_path: str) -> threading.Lock:
+    with _store_cache_lock:
+        lock = _path_locks.get(abs_path)
+        if lock is None:
+            lock = _path_locks[abs_path] = threading.Lock()
+        return lock
+
+
+def _clear_chroma_system_cache() -> None:
+    """
+    chromadb keeps one shared client per persist directory; drop it so a
+    recreated directory gets a fresh client instead of a stale one.
+    """
+    try:
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+    except Exception:
+        pass
+
+
 def reset_vector_store(store_path: Optional[str] = None) -> None:
     """
     Delete persisted vector store directory to clear previous embeddings.
     """
-    abs_path = Path(resolve_path(store_path))
-    if abs_path.exists():
-        shutil.rmtree(abs_path)
-    abs_path.mkdir(parents=True, exist_ok=True)
+    abs_path = resolve_path(store_path)
+    with _path_lock(abs_path):
+        with _store_cache_lock:
+            vectordb = _store_cache.pop(abs_path, None)
+        if vectordb is not None:
+            try:
+                vectordb.delete_collection()
+            except Exception:
+                pass
+        _clear_chroma_system_cache()
+        drop_lexical_index(abs_path)
+
+        path = Path(abs_path)
+        if path.exists():
+            shutil.rmtree(path)
+        path.mkdir(parents=True, exist_ok=True)
+        bump_index_version(abs_path)
+
+
+def get_index_version(store_path: Optional[str] = None) -> str:
+    """
+    Opaque token identifying the current contents of a store. It is kept on
+    disk so every worker process sees the same value.
+    """
+    path = Path(resolve_path(store_path)) / INDEX_VERSION_NAME
+    try:
+        return path.read_text(encoding="utf-8").strip() or "0"
+    except OSError:
+        return "0"
+
+
+def bump_index_version(store_path: Optional[str] = None) -> str:
+    """
+    Record that a store's contents changed; invalidates answers cached for it.
+    """
+    path = Path(resolve_path(store_path)) / INDEX_VERSION_NAME
+    version = uuid.uuid4().hex
+    tmp = path.with_name(f"{INDEX_VERSION_NAME}.{version}.tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, path)
+    return version
 
 
-def get_vector_store(store_path: Optional[str] = None) -> Chroma:
+def _open_store(abs_path: str, embeddings: Embeddings) -> VectorStore:
     """
-    Return a Chroma vector store instance at the given path.
+    Open the VECTOR_BACKEND store in a directory. Backends are LangChain
+    VectorStores that also provide persist(), get() and delete_collection().
+    """
+    if VECTOR_BACKEND == "numpy":
+        return NumpyVectorStore(persist_directory=abs_path, embedding_function=embeddings)
+    if VECTOR_BACKEND != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}'; expected 'chroma' or 'numpy'")
+    return Chroma(persist_directory=abs_path, embedding_function=embeddings)
+
+
+def get_vector_store(store_path: Optional[str] = None) -> VectorStore:
+    """
+    Return the vector store (VECTOR_BACKEND) at the given path.
+    Handles are cached per resolved path (bounded LRU) and shared across requests.
     """
     abs_path = resolve_path(store_path)
-    embeddings = get_embeddings_model()
-    vectordb = Chroma(
-        persist_directory=abs_path,
-        embedding_function=embeddings,
+    with _store_cache_lock:
+        vectordb = _store_cache.get(abs_path)
+        if vectordb is not None:
+            _store_cache.move_to_end(abs_path)
+            return vectordb
+
+    with _path_lock(abs_path):
+        # Re-check: another request may have opened it while we waited
+        with _store_cache_lock:
+            vectordb = _store_cache.get(abs_path)
+            if vectordb is not None:
+                _store_cache.move_to_end(abs_path)
+                return vectordb
+
+        # Document embeddings go through the persistent content-hash cache;
+        # concurrent query embeddings are batched into one forward pass
+        model = get_embeddings_model()
+        embeddings = with_embedding_cache(
+            with_query_batching(model), cache_namespace(model, embedding_runtime(model))
+        )
+        vectordb = _open_store(abs_path, embeddings)
+
+        with _store_cache_lock:
+            _store_cache[abs_path] = vectordb
+            while len(_store_cache) > max(VECTOR_STORE_CACHE_SIZE, 1):
+                _store_cache.popitem(last=False)
+        return vectordb
+
+
+def embed_query(query: str, store_path: Optional[str] = None) -> List[float]:
+    """
+    Embed a query with the store's embedding function (shares its query memo).
+    """
+    return get_vector_store(store_path).embeddings.embed_query(query)
+
+
+def embed_query_batch(queries: List[str], store_path: Optional[str] = None) -> List[List[float]]:
+    """
+    Embed several queries in one forward pass (memoised like embed_query).
+    """
+    return embed_queries(get_vector_store(store_path).embeddings, queries)
+
+
+def search_by_vectors(
+    vectors: List[List[float]], k: int = 5, store_path: Optional[str] = None
+) -> List[List[Document]]:
+    """
+    Top-k documents for several query vectors in one store call where the
+    backend supports it (NumPy: one matrix product; Chroma: one batched
+    collection query).
+    """
+    if not vectors:
+        return []
+    vectordb = get_vector_store(store_path)
+    if isinstance(vectordb, NumpyVectorStore):
+        return [[doc for doc, _ in hits] for hits in vectordb.similarity_search_with_score_by_vectors(vectors, k)]
+    collection = getattr(vectordb, "_collection", None)
+    if collection is None:
+        return [vectordb.similarity_search_by_vector(vector, k=k) for vector in vectors]
+    results = collection.query(query_embeddings=vectors, n_results=k, include=["documents", "metadatas"])
+    return [
+        [
+            Document(id=doc_id, page_content=text or "", metadata=meta or {})
+            for doc_id, text, meta in zip(ids, texts, metas)
+        ]
+        for ids, texts, metas in zip(results["ids"], results["documents"], results["metadatas"])
+    ]
+
+
+def retrieve_batch(
+    queries: List[str],
+    k: int = 5,
+    store_path: Optional[str] = None,
+    mode: Optional[str] = None
+) -> List[List[Document]]:
+    """
+    Batch form of retrieve_documents: the queries are embedded in one
+    forward pass and searched together; BM25 runs per query (it needs no
+    embedding) and is fused exactly like HybridRetriever does.
+    """
+    mode = (mode or RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'; expected one of {', '.join(RETRIEVAL_MODES)}")
+    if not queries:
+        return []
+
+    candidates = k * max(HYBRID_CANDIDATES, 1) if mode == "hybrid" else k
+    vector_hits: List[List[Document]] = []
+    if mode != "lexical":
+        vectors = embed_query_batch(queries, store_path)
+        vector_hits = search_by_vectors(vectors, candidates, store_path)
+        if mode == "vector":
+            return vector_hits
+
+    index = get_lexical_store(store_path)
+    lexical_hits = [[doc for doc, _ in index.search(query, candidates)] for query in queries]
+    if mode == "lexical":
+        return lexical_hits
+    return [reciprocal_rank_fusion([lexical, vector], k) for lexical, vector in zip(lexical_hits, vector_hits)]
+
+
+def get_lexical_store(store_path: Optional[str] = None) -> BM25Index:
+    """
+    Return the store's BM25 index. Stores indexed before the lexical index
+    existed get it built once from the chunks already in the vector store.
+    """
+    abs_path = resolve_path(store_path)
+    index = get_lexical_index(abs_path)
+    with index.lock:
+        if not index.exists():
+            data = get_vector_store(abs_path).get(include=["documents", "metadatas"])
+            index.add(
+                Document(id=i, page_content=text or "", metadata=meta or {})
+                for i, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+            )
+            # Written even for an empty store, so the build runs only once
+            index.save()
+    return index
+
+
+def get_retriever(k: int = 5, store_path: Optional[str] = None, mode: Optional[str] = None):
+    """
+    Return a top-k retriever over the cached store handle.
+    mode (default RETRIEVAL_MODE) selects vector, lexical or hybrid retrieval.
+    """
+    mode = (mode or RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'; expected one of {', '.join(RETRIEVAL_MODES)}")
+    if mode == "vector":
+        return get_vector_store(store_path).as_retriever(search_kwargs={"k": k})
+
+    index = get_lexical_store(store_path)
+    if mode == "lexical":
+        return HybridRetriever(index=index, k=k, mode=mode)
+    vector_retriever = get_vector_store(store_path).as_retriever(
+        search_kwargs={"k": k * max(HYBRID_CANDIDATES, 1)}
     )
-    return vectordb
+    return HybridRetriever(index=index, vector_retriever=vector_retriever, k=k, mode=mode)
 
 
 def add_documents(
-    docs: List[Document],
+    docs: Iterable[Document],
     store_path: Optional[str] = None,
-    reset: bool = False
+    reset: bool = False,
+    batch_size: Optional[int] = None,
+    persist: bool = True
 ) -> int:
     """
     Add new documents to the vector store.
     - reset=True clears old data first
     - reset=False appends to existing store
-    Always persists after adding.
+    docs may be any iterable (e.g. the iter_chunks generator); it is consumed
+    in fixed-size batches so memory stays bounded for large files.
+    Documents that carry an id are upserted under that id; the others get a
+    random one. Chunks are added to the BM25 index too.
+    Persists after adding unless persist=False (callers writing several
+    batches then call persist_vector_store once).
     """
     if reset:
         reset_vector_store(store_path)
 
     vectordb = get_vector_store(store_path)
-    if docs:
-        vectordb.add_documents(docs)
+    lexical = get_lexical_store(store_path)
+    count = 0
+    for batch in batched(docs, batch_size or EMBED_BATCH_SIZE):
+        for doc in batch:
+            if not doc.id:
+                doc.id = str(uuid.uuid4())
+        # Stable IDs make the write an upsert; includes embedding cache misses
+        with timed("index_write"):
+            vectordb.add_documents(batch, ids=[doc.id for doc in batch])
+            lexical.add(batch)
+        INDEXED_CHUNKS.inc(len(batch))
+        count += len(batch)
+    if count:
+        bump_index_version(store_path)
+    if count and persist:
         # Ensure data is flushed to disk
+        with timed("persist"):
+            vectordb.persist()
+            lexical.save()
+    return count
+
+
+def delete_documents(
+    ids: List[str],
+    store_path: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    persist: bool = True
+) -> int:
+    """
+    Delete documents by id from the vector store.
+    """
+    vectordb = get_vector_store(store_path)
+    lexical = get_lexical_store(store_path)
+    for batch in batched(ids, batch_size or EMBED_BATCH_SIZE):
+        vectordb.delete(ids=batch)
+        lexical.delete(batch)
+    if ids:
+        bump_index_version(store_path)
+    if ids and persist:
+        with timed("persist"):
+            vectordb.persist()
+            lexical.save()
+    return len(ids)
+
+
+def persist_vector_store(store_path: Optional[str] = None) -> None:
+    """
+    Flush the store and its BM25 index to disk.
+    """
+    vectordb, lexical = get_vector_store(store_path), get_lexical_store(store_path)
+    with timed("persist"):
         vectordb.persist()
-    return len(docs)
+        lexical.save()
 
 
 def retrieve_documents(
     query: str,
     k: int = 5,
-    store_path: Optional[str] = None
+    store_path: Optional[str] = None,
+    mode: Optional[str] = None
 ):
     """
     Retrieve top-k relevant documents for a query.
     """
-    vectordb = get_vector_store(store_path)
-    retriever = vectordb.as_retriever(search_kwargs={"k": k})
+    retriever = get_retriever(k=k, store_path=store_path, mode=mode)
     docs = retriever.get_relevant_documents(query)
     return docs
@@ -0,0 +1,461 @@
+# backend/benchmarks/offline_suite.py
+"""
+End-to-end offline benchmark: ingestion, retrieval and /api/chat under
+concurrent load, with no network access.
+
+Run from backend/:
+    python -m benchmarks.offline_suite
+    python -m benchmarks.offline_suite --files 5 --pdf-pages 50 --csv-rows 20000 \\
+        --concurrency 1,8,32 --llm-latency-ms 300 --output bench.json
+
+- Synthetic PDF, DOCX and CSV corpora are generated from a seeded RNG, so
+  two runs with the same arguments index the same text.
+- get_llm() is replaced by a deterministic fake chat model that sleeps
+  --llm-latency-ms per call (streamed word by word) and reports token usage.
+- Embeddings default to a hashing model (--embeddings hash); use
+  --embeddings model to run the configured EMBEDDING_MODEL (must already be
+  in the local Hugging Face cache).
+- The embedding cache goes to a temporary file and the answer cache is off
+  unless ANSWER_CACHE / EMBEDDING_CACHE_PATH are set explicitly, so every
+  run starts cold.
+
+Results (docs/sec, peak RSS, retrieval and chat latency percentiles, stage
+timings from metrics_service) are printed as JSON and optionally written
+to --output for tracking regressions. The report is the only thing written
+to stdout (the app's own log lines go to stderr), so it can be piped, e.g.
+into jq.
+"""
+import os
+import tempfile
+
+# Must be set before the app modules read their configuration. Extraction
+# workers re-import this module; they inherit the parent's environment.
+_TMP_DIR = os.path.join(tempfile.gettempdir(), f"bench_offline_{os.getpid()}")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(_TMP_DIR, "embedding_cache.sqlite3"))
+os.environ.setdefault("ANSWER_CACHE", "false")
+os.environ.setdefault("GROQ_API_KEY", "offline")
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.services import chunking_service, document_service, llm_service, vector_service
+from app.services.document_service import docx, get_extraction_pool, load_documents, pymupdf, shutdown_extraction_pool
+from app.services.ingest_service import iter_ingest_files
+from app.services.metrics_service import STAGE_SECONDS
+from app.services.vector_service import RETRIEVAL_MODES, reset_vector_store, retrieve_documents
+
+WORDS = (
+    "revenue margin forecast contract renewal region supplier invoice shipment warranty "
+    "inventory backlog churn onboarding latency outage capacity budget audit compliance "
+    "pricing discount quota pipeline migration release incident customer partner vendor "
+    "license subscription retention escalation roadmap headcount payroll expense travel"
+).split()
+REGIONS = ["north", "south", "east", "west", "central"]
+
+
+# --- Offline stand-ins -----------------------------------------------------
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings (feature hashing, L2-normalised).
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_name = f"offline-hash-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model: answers with a digest of the prompt after
+    latency_ms, and rewrites condense prompts to their follow-up question.
+    """
+
+    latency_ms: float = 0.0
+    model_name: str = "offline-fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-fake"
+
+    @staticmethod
+    def _reply(messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if "Follow Up Input:" in prompt:
+            return prompt.split("Follow Up Input:", 1)[1].split("\n", 1)[0].strip()
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        words = prompt.split()
+        return f"Offline answer {digest} from {len(words)} prompt words: " + " ".join(words[-24:])
+
+    @staticmethod
+    def _message(messages: List[BaseMessage], text: str) -> AIMessage:
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(text.split())
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, self._reply(messages)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, self._reply(messages)))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ):
+        text = self._reply(messages)
+        words = text.split(" ")
+        for word in words:
+            await asyncio.sleep(self.latency_ms / 1000 / len(words))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+        usage = self._message(messages, text).usage_metadata
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+def install_fakes(embeddings: str, llm_latency_ms: float) -> FakeChatModel:
+    """
+    Point the services at the offline LLM (and hashing embeddings unless
+    the real model was asked for).
+    """
+    llm = FakeChatModel(latency_ms=llm_latency_ms)
+    llm_service.get_llm = lambda model=None: llm
+    if embeddings == "hash":
+        model = HashEmbeddings()
+        vector_service.get_embeddings_model = lambda *a, **kw: model
+        # No tokenizer: chunk sizes are counted in whitespace words
+        chunking_service.get_embeddings_model = lambda *a, **kw: model
+    return llm
+
+
+# --- Synthetic corpora -------------------------------------------------------
+
+def _code(kind: str, n: int) -> str:
+    return f"{kind}-{n:05d}"
+
+
+def _sentence(rng: random.Random, code: str) -> str:
+    words = rng.choices(WORDS, k=rng.randint(10, 18))
+    words.insert(rng.randint(0, len(words)), code)
+    return " ".join(words).capitalize() + "."
+
+
+def write_pdf(path: str, pages: int, rng: random.Random, offset: int) -> None:
+    with pymupdf.open() as pdf:
+        for page_no in range(pages):
+            page = pdf.new_page()
+            text = " ".join(_sentence(rng, _code("PG", offset + page_no)) for _ in range(14))
+            page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), text, fontsize=9)
+        pdf.save(path)
+
+
+def write_docx(path: str, paragraphs: int, rng: random.Random, offset: int) -> None:
+    d = docx.Document()
+    for n in range(paragraphs):
+        d.add_paragraph(" ".join(_sentence(rng, _code("DX", offset + n)) for _ in range(3)))
+    d.save(path)
+
+
+def write_csv(path: str, rows: int, rng: random.Random, offset: int) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sku", "region", "price", "quantity", "notes"])
+        for n in range(rows):
+            writer.writerow([
+                _code("SKU", offset + n),
+                rng.choice(REGIONS),
+                f"{rng.uniform(1, 500):.2f}",
+                rng.randint(1, 1000),
+                " ".join(rng.choices(WORDS, k=6)),
+            ])
+
+
+def make_corpus(root: str, args: argparse.Namespace, rng: random.Random) -> Dict[str, List[str]]:
+    """
+    Files per format, plus the codes they contain (used to build queries).
+    """
+    writers = {
+        "pdf": (write_pdf, args.pdf_pages, pymupdf is not None),
+        "docx": (write_docx, args.docx_paragraphs, docx is not None),
+        "csv": (write_csv, args.csv_rows, True),
+    }
+    corpus: Dict[str, List[str]] = {}
+    for fmt, (write, size, available) in writers.items():
+        if not available:
+            print(f"Skipping {fmt}: its library is not installed", file=sys.stderr)
+            continue
+        corpus[fmt] = []
+        for i in range(args.files):
+            path = os.path.join(root, f"bench_{fmt}_{i:03d}.{fmt}")
+            write(path, size, rng, i * size)
+            corpus[fmt].append(path)
+    return corpus
+
+
+def make_queries(args: argparse.Namespace, corpus: Dict[str, List[str]], rng: random.Random) -> List[str]:
+    sizes = {"pdf": ("PG", args.pdf_pages), "docx": ("DX", args.docx_paragraphs), "csv": ("SKU", args.csv_rows)}
+    queries = []
+    for n in range(args.queries):
+        fmt = rng.choice(sorted(corpus))
+        kind, size = sizes[fmt]
+        if n % 2:
+            queries.append(f"What does the document say about {_code(kind, rng.randrange(size * args.files))}?")
+        else:
+            queries.append(f"How did {' and '.join(rng.sample(WORDS, 2))} change in the {rng.choice(REGIONS)} region?")
+    return queries
+
+
+# --- Measurements ------------------------------------------------------------
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    if not latencies_ms:
+        return {}
+    return {
+        "p50_ms": round(statistics.median(latencies_ms), 3),
+        "p99_ms": round(_percentile(latencies_ms, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3),
+        "max_ms": round(max(latencies_ms), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def start_extraction_pool(corpus: Dict[str, List[str]]) -> float:
+    """
+    Spawn the extraction workers (and their imports) before the timed runs.
+    """
+    started = time.perf_counter()
+    pool = get_extraction_pool()
+    if pool is not None:
+        sample = [paths[0] for paths in corpus.values()][:1] * document_service.EXTRACT_WORKERS
+        list(pool.map(load_documents, sample))
+    return round(time.perf_counter() - started, 3)
+
+
+async def bench_ingestion(corpus: Dict[str, List[str]], store: str, batch_size: Optional[int]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    total = {"files": 0, "documents": 0, "chunks": 0, "seconds": 0.0}
+    for fmt, paths in corpus.items():
+        started = time.perf_counter()
+        documents = chunks = failed = 0
+        async for result in iter_ingest_files(paths, store_path=store, batch_size=batch_size):
+            if result["status"] == "failed":
+                failed += 1
+                print(f"Ingestion failed for {result['source']}: {result.get('error')}", file=sys.stderr)
+            documents += result["documents"]
+            chunks += result["chunks"]
+        seconds = time.perf_counter() - started
+        results[fmt] = {
+            "files": len(paths),
+            "failed": failed,
+            "documents": documents,
+            "chunks": chunks,
+            "seconds": round(seconds, 3),
+            "docs_per_second": round(documents / seconds, 1) if seconds else None,
+            "chunks_per_second": round(chunks / seconds, 1) if seconds else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        for key, value in (("files", len(paths)), ("documents", documents), ("chunks", chunks), ("seconds", seconds)):
+            total[key] += value
+    total["docs_per_second"] = round(total["documents"] / total["seconds"], 1) if total["seconds"] else None
+    total["seconds"] = round(total["seconds"], 3)
+    results["total"] = total
+    return results
+
+
+def bench_retrieval(queries: List[str], store: str, k: int) -> Dict[str, Any]:
+    results = {}
+    for mode in RETRIEVAL_MODES:
+        retrieve_documents(queries[0], k=k, store_path=store, mode=mode)  # open handles, load indexes
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            retrieve_documents(query, k=k, store_path=store, mode=mode)
+            latencies.append((time.perf_counter() - started) * 1000)
+        results[mode] = {"queries": len(queries), **_latency_summary(latencies)}
+    return results
+
+
+async def bench_chat(
+    queries: List[str], store: str, k: int, concurrency: int, requests: int, mode: str, stream: bool
+) -> Dict[str, Any]:
+    from app.main import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    path = "/api/chat/stream" if stream else "/api/chat"
+
+    async def one(client: httpx.AsyncClient, n: int) -> None:
+        params = {
+            "session_id": f"bench-{concurrency}-{n}",
+            "query": queries[n % len(queries)],
+            "mode": mode,
+            "chroma_dir": store,
+            "k": k,
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, params=params)
+            await response.aread()
+            latencies.append((time.perf_counter() - started) * 1000)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await one(client, -1)  # load routers and open the store outside the timed run
+        latencies.clear()
+        statuses.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, n) for n in range(requests)))
+        seconds = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "mode": mode,
+        "stream": stream,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(requests / seconds, 2) if seconds else None,
+        "status_codes": statuses,
+        **_latency_summary(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=3, help="files per format")
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--docx-paragraphs", type=int, default=200)
+    parser.add_argument("--csv-rows", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=None, help="chunks per write (default EMBED_BATCH_SIZE)")
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated chat concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="chat requests per concurrency level")
+    parser.add_argument("--chat-mode", default="standard", choices=["standard", "deep"])
+    parser.add_argument("--stream", action="store_true", help="benchmark /api/chat/stream instead")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--embeddings", default="hash", choices=["hash", "model"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    install_fakes(args.embeddings, args.llm_latency_ms)
+    rng = random.Random(args.seed)
+    corpus_dir = os.path.join(_TMP_DIR, "corpus")
+    store = os.path.join(_TMP_DIR, "store")
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    try:
+        started = time.perf_counter()
+        corpus = make_corpus(corpus_dir, args, rng)
+        corpus_seconds = time.perf_counter() - started
+        queries = make_queries(args, corpus, rng)
+
+        reset_vector_store(store)
+        pool_seconds = start_extraction_pool(corpus)
+        ingestion = asyncio.run(bench_ingestion(corpus, store, args.batch_size))
+        retrieval = bench_retrieval(queries, store, args.k)
+        chat = [
+            asyncio.run(bench_chat(queries, store, args.k, int(c), args.requests, args.chat_mode, args.stream))
+            for c in args.concurrency.split(",")
+        ]
+    finally:
+        shutdown_extraction_pool()
+        shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "vector_backend": vector_service.VECTOR_BACKEND,
+            "retrieval_mode": vector_service.RETRIEVAL_MODE,
+            "pdf_backend": document_service.pdf_backend() if "pdf" in corpus else None,
+            "extract_workers": document_service.EXTRACT_WORKERS,
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "corpus": {
+            "formats": {fmt: len(paths) for fmt, paths in corpus.items()},
+            "generate_seconds": round(corpus_seconds, 3),
+        },
+        "extraction_pool_start_seconds": pool_seconds,
+        "ingestion": ingestion,
+        "retrieval": retrieval,
+        "chat": chat,
+        "stages": STAGE_SECONDS.summary(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# backend/benchmarks/vector_backends.py
+"""
+Compare the Chroma and NumPy vector backends on synthetic data.
+
+Run from backend/:
+    python -m benchmarks.vector_backends --chunks 50000 --dim 768
+
+Vectors are random unit vectors, so the numbers measure the stores, not the
+embedding model. Reports build time, reopen time, query latency
+(p50/p99, by vector) and on-disk size as JSON.
+"""
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+from app.services.numpy_store import NumpyVectorStore
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Looks texts up in a precomputed table instead of running a model.
+    """
+
+    def __init__(self, table: Dict[str, List[float]]):
+        self.table = table
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.table[t] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.table[text]
+
+
+def _open(backend: str, path: str, embeddings: Embeddings):
+    if backend == "numpy":
+        return NumpyVectorStore(persist_directory=path, embedding_function=embeddings)
+    return Chroma(persist_directory=path, embedding_function=embeddings)
+
+
+def _dir_size(path: str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(backend: str, texts: List[str], vectors: np.ndarray, queries: np.ndarray, k: int, batch: int) -> Dict:
+    path = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    embeddings = PrecomputedEmbeddings({t: v.tolist() for t, v in zip(texts, vectors)})
+    try:
+        started = time.perf_counter()
+        store = _open(backend, path, embeddings)
+        for i in range(0, len(texts), batch):
+            part = texts[i:i + batch]
+            rows = range(i, i + len(part))
+            store.add_texts(part, [{"row": r} for r in rows], ids=[f"c{r}" for r in rows])
+        store.persist()
+        build_seconds = time.perf_counter() - started
+        del store
+
+        if backend == "chroma":
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        started = time.perf_counter()
+        store = _open(backend, path, embeddings)
+        store.similarity_search_by_vector(queries[0].tolist(), k=k)  # first query pays lazy loading
+        open_seconds = time.perf_counter() - started
+
+        latencies = []
+        for q in queries:
+            started = time.perf_counter()
+            store.similarity_search_by_vector(q.tolist(), k=k)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        return {
+            "backend": backend,
+            "build_seconds": round(build_seconds, 3),
+            "open_and_first_query_seconds": round(open_seconds, 4),
+            "query_ms_p50": round(statistics.median(latencies), 3),
+            "query_ms_p99": round(_percentile(latencies, 99), 3),
+            "disk_bytes": _dir_size(path),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--backends", default="chroma,numpy")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.chunks, args.queries)]
+    texts = [f"chunk {i}" for i in range(args.chunks)]
+
+    results = [
+        run(backend.strip(), texts, vectors, queries, args.k, args.batch)
+        for backend in args.backends.split(",")
+    ]
+    print(json.dumps({"chunks": args.chunks, "dim": args.dim, "k": args.k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# backend/tests/conftest.py
+import hashlib
+import math
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Tests run offline: extraction in-process, no model warm-up and no shared
+# on-disk embedding cache
+os.environ.setdefault("EXTRACT_WORKERS", "0")
+os.environ.setdefault("EMBEDDING_WARMUP", "0")
+os.environ.setdefault("EMBEDDING_CACHE", "false")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings (hashed into a small vector), so
+    tests never download or load a model.
+    """
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """
+    Make the shared embedding model a HashEmbeddings (no tokenizer, so token
+    counts fall back to whitespace words).
+    """
+    import app.services.embedding_service as embedding_service
+
+    monkeypatch.setattr(embedding_service, "HuggingFaceEmbeddings", lambda **kwargs: HashEmbeddings())
+    monkeypatch.setattr(embedding_service, "_registry", {})
+    monkeypatch.setattr(embedding_service, "_registry_stats", {})
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch, fake_embeddings):
+    """
+    An empty store directory on the NumPy backend.
+    """
+    import app.services.vector_service as vector_service
+
+    monkeypatch.setattr(vector_service, "VECTOR_BACKEND", "numpy")
+    path = tmp_path / "store"
+    yield str(path)
+    vector_service.reset_vector_store(str(path))
@@ -0,0 +1,85 @@
+# backend/tests/test_answer_cache.py
+import asyncio
+
+import pytest
+
+from app.api import chat
+from app.services.answer_cache import AnswerCache
+from app.services.ingest_service import delete_source, iter_ingest_files
+
+SCOPE = ("/store", "v1", "rag/hybrid", 5)
+
+
+def test_lookup_hits_similar_query_in_same_scope():
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.9)
+    cache.put(SCOPE, [1.0, 0.0], {"answer": "42"})
+
+    payload, similarity = cache.lookup(SCOPE, [0.99, 0.05])
+    assert payload == {"answer": "42"} and similarity > 0.9
+    assert cache.lookup(SCOPE, [0.0, 1.0]) is None
+    assert cache.lookup(SCOPE[:1] + ("v2",) + SCOPE[2:], [1.0, 0.0]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_entries_expire_and_are_evicted():
+    cache = AnswerCache(max_entries=2, ttl=0, threshold=0.9)
+    cache.put(SCOPE, [1.0, 0.0], {"answer": "old"})
+    assert cache.lookup(SCOPE, [1.0, 0.0]) is None
+
+    cache.ttl = 60
+    for n in range(3):
+        cache.put(SCOPE, [1.0, float(n)], {"answer": str(n)})
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AnswerCache(max_entries=10, ttl=60, threshold=0.95)
+    monkeypatch.setattr(chat, "answer_cache", cache)
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", True)
+    return cache
+
+
+def _ingest(path, store_path):
+    async def run():
+        return [result async for result in iter_ingest_files([str(path)], store_path=store_path)]
+    return asyncio.run(run())
+
+
+def _lookup(query, store_path):
+    return asyncio.run(chat._lookup_answer(query, "rag", "hybrid", 5, store_path))
+
+
+def test_ingest_invalidates_cached_answers(store_path, tmp_path, cache):
+    first = tmp_path / "first.txt"
+    first.write_text("Quinces ripen late in autumn.", encoding="utf-8")
+    _ingest(first, store_path)
+
+    cached, scope, vector = _lookup("When do quinces ripen?", store_path)
+    assert cached is None
+    cache.put(scope, vector, {"answer": "In autumn.", "sources": []})
+    cached, _, _ = _lookup("When do quinces ripen?", store_path)
+    assert cached["answer"] == "In autumn." and cached["cache"]["hit"]
+
+    second = tmp_path / "second.txt"
+    second.write_text("Quinces also ripen in early winter.", encoding="utf-8")
+    _ingest(second, store_path)
+
+    cached, new_scope, _ = _lookup("When do quinces ripen?", store_path)
+    assert cached is None
+    assert new_scope[1] != scope[1]
+
+    cache.put(new_scope, vector, {"answer": "Autumn or early winter.", "sources": []})
+    delete_source("second.txt", store_path)
+    assert _lookup("When do quinces ripen?", store_path)[0] is None
+
+
+def test_unchanged_reingest_keeps_cached_answers(store_path, tmp_path, cache):
+    source = tmp_path / "first.txt"
+    source.write_text("Quinces ripen late in autumn.", encoding="utf-8")
+    _ingest(source, store_path)
+    _, scope, vector = _lookup("When do quinces ripen?", store_path)
+    cache.put(scope, vector, {"answer": "In autumn.", "sources": []})
+
+    assert [r["status"] for r in _ingest(source, store_path)] == ["unchanged"]
+    assert _lookup("When do quinces ripen?", store_path)[0]["answer"] == "In autumn."
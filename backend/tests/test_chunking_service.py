@@ -0,0 +1,70 @@
+# backend/tests/test_chunking_service.py
+import re
+
+import pytest
+from langchain.schema import Document
+
+from app.services import chunking_service
+from app.services.chunking_service import _iter_windows, iter_chunks
+
+
+def _words(text):
+    return [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+
+
+def _text(words):
+    return " ".join(f"w{i}" for i in range(words))
+
+
+@pytest.mark.parametrize("words,size,overlap", [(1, 8, 2), (8, 8, 2), (9, 8, 2), (50, 8, 2), (50, 8, 0), (37, 5, 4)])
+def test_windows_cover_text_with_overlap(words, size, overlap):
+    text = _text(words)
+    spans = _words(text)
+    windows = list(_iter_windows(text, None, size, overlap))
+
+    assert windows[0][0] == 0
+    assert windows[-1][1] == len(text)
+    starts = [s for s, _ in spans]
+    ends = [e for _, e in spans]
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        # Each window holds exactly chunk_size tokens, the next starts chunk_overlap tokens back
+        assert ends.index(end) - starts.index(start) + 1 == size
+        assert ends.index(end) - starts.index(next_start) + 1 == overlap
+    start, end = windows[-1]
+    assert ends.index(end) - starts.index(start) + 1 <= size
+
+
+def test_windows_ignore_surrounding_whitespace():
+    text = "\n\n  alpha beta  \n gamma \t"
+    assert [text[s:e] for s, e in _iter_windows(text, None, 2, 0)] == ["alpha beta", "gamma"]
+
+
+@pytest.mark.parametrize("text", ["", "   \n\t  "])
+def test_windows_of_blank_text(text):
+    assert list(_iter_windows(text, None, 8, 2)) == []
+
+
+# Every segment holds more than one 16-token window (as real segments do)
+@pytest.mark.parametrize("segment_chars", [80, 100, 200, 300])
+def test_windows_do_not_depend_on_segmenting(monkeypatch, segment_chars):
+    text = "\n".join(_text(13) for _ in range(12))
+    expected = list(_iter_windows(text, None, 16, 4))
+
+    monkeypatch.setattr(chunking_service, "_SEGMENT_CHARS", segment_chars)
+    assert list(_iter_windows(text, None, 16, 4)) == expected
+
+
+def test_iter_chunks_offsets_and_metadata(fake_embeddings):
+    text = _text(20)
+    doc = Document(page_content=text, metadata={"source": "a.txt", "page": 3})
+    chunks = list(iter_chunks([doc], chunk_size=8, chunk_overlap=2, tokenizer=None))
+
+    assert len(chunks) == 3
+    for chunk in chunks:
+        assert chunk.metadata["source"] == "a.txt" and chunk.metadata["page"] == 3
+        assert text[chunk.metadata["start_index"]:chunk.metadata["end_index"]] == chunk.page_content
+
+
+def test_iter_chunks_rejects_overlap_not_below_size():
+    with pytest.raises(ValueError):
+        list(iter_chunks([Document(page_content="a b c")], chunk_size=4, chunk_overlap=4))
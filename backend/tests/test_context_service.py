@@ -0,0 +1,86 @@
+# backend/tests/test_context_service.py
+import pytest
+from langchain.schema import Document
+
+from app.services import context_service
+from app.services.context_service import pack_context
+
+
+def _doc(name, words, start=0):
+    return Document(page_content=" ".join(f"{name}{i}" for i in range(start, start + words)), metadata={"source": name})
+
+
+def _tokens(doc):
+    return len(doc.page_content.split())
+
+
+@pytest.fixture(autouse=True)
+def min_passage(monkeypatch, fake_embeddings):
+    monkeypatch.setattr(context_service, "CONTEXT_MIN_PASSAGE_TOKENS", 5)
+
+
+def test_everything_fits():
+    docs = [_doc("a", 10), _doc("b", 10)]
+    packed, stats = pack_context(docs, budget=100)
+
+    assert packed == docs
+    assert stats["tokens"] == stats["retrieved_tokens"] == 20
+    assert (stats["duplicates"], stats["over_budget"], stats["truncated"]) == (0, 0, 0)
+
+
+def test_budget_is_never_exceeded():
+    docs = [_doc(name, 30) for name in "abcde"]
+    for budget in (1, 29, 30, 31, 64, 100, 149, 150):
+        packed, stats = pack_context(docs, budget=budget)
+        assert sum(_tokens(doc) for doc in packed) == stats["tokens"] <= budget
+        assert stats["packed"] == len(packed)
+
+
+def test_overflowing_passage_is_cut_to_the_room_left():
+    docs = [_doc("a", 30), _doc("b", 30), _doc("c", 30)]
+    packed, stats = pack_context(docs, budget=70)
+
+    assert [doc.metadata["source"] for doc in packed] == ["a", "b", "c"]
+    assert [_tokens(doc) for doc in packed] == [30, 30, 10]
+    assert packed[2].page_content == _doc("c", 10).page_content
+    assert (stats["truncated"], stats["tokens"]) == (1, 70)
+
+
+def test_too_little_room_skips_the_passage():
+    docs = [_doc("a", 30), _doc("b", 30), _doc("c", 3)]
+    packed, stats = pack_context(docs, budget=33)
+
+    # b would be cut to 3 tokens (< min passage); the short c still fits
+    assert [doc.metadata["source"] for doc in packed] == ["a", "c"]
+    assert (stats["over_budget"], stats["truncated"], stats["tokens"]) == (1, 0, 33)
+
+
+def test_best_passage_is_always_sent():
+    packed, stats = pack_context([_doc("a", 30), _doc("b", 5)], budget=2)
+
+    assert [_tokens(doc) for doc in packed] == [2]
+    assert (stats["truncated"], stats["over_budget"]) == (1, 1)
+
+
+def test_zero_budget_disables_trimming():
+    docs = [_doc(name, 500) for name in "abc"]
+    packed, stats = pack_context(docs, budget=0)
+
+    assert packed == docs
+    assert stats["tokens"] == 1500
+
+
+def test_near_duplicates_are_dropped():
+    docs = [_doc("a", 40), _doc("a", 40, start=2), _doc("b", 40), _doc("a", 20, start=30)]
+    packed, stats = pack_context(docs, budget=1000)
+
+    assert [doc.page_content for doc in packed] == [docs[0].page_content, docs[2].page_content, docs[3].page_content]
+    assert stats["duplicates"] == 1
+
+
+def test_duplicates_do_not_use_budget():
+    docs = [_doc("a", 30), _doc("a", 30), _doc("b", 30)]
+    packed, stats = pack_context(docs, budget=60)
+
+    assert [doc.metadata["source"] for doc in packed] == ["a", "b"]
+    assert stats["tokens"] == 60
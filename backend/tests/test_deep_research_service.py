@@ -0,0 +1,75 @@
+# backend/tests/test_deep_research_service.py
+import asyncio
+import re
+import threading
+
+import pytest
+from langchain.schema import Document
+from langchain_core.messages import AIMessage
+
+from app.services import deep_research_service
+from app.services.deep_research_service import SummaryCache, asummarize_documents
+
+
+class EchoSummaryLLM:
+    """
+    Summarises text t as "S(t)", one entry per numbered text when packed.
+    """
+
+    model_name = "echo"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        if prompt.startswith("Write a concise summary of each"):
+            entries = re.findall(r"^\[(\d+)\] (.*)$", prompt, re.MULTILINE)
+            return AIMessage(content="\n".join(f"[{n}] S({text})" for n, text in entries))
+        text = prompt.split('"')[1]
+        return AIMessage(content=f"S({text})")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, fake_embeddings):
+    monkeypatch.setattr(deep_research_service, "summary_cache", SummaryCache(100))
+
+
+def _docs(*texts):
+    return [Document(page_content=text) for text in texts]
+
+
+def test_combine_keeps_retrieval_order_whatever_is_cached():
+    llm = EchoSummaryLLM()
+    asyncio.run(asummarize_documents(llm, _docs("beta")))
+    summary, stats = asyncio.run(asummarize_documents(llm, _docs("alpha", "beta", "gamma")))
+
+    assert stats["cached"] == 1
+    assert '"S(alpha)\n\nS(beta)\n\nS(gamma)"' in llm.prompts[-1]
+    assert summary == "S(S(alpha)\n\nS(beta)\n\nS(gamma))"
+
+
+def test_packed_map_call_caches_each_document():
+    llm = EchoSummaryLLM()
+    asyncio.run(asummarize_documents(llm, _docs("alpha", "beta")))
+    calls = len(llm.prompts)
+    _, stats = asyncio.run(asummarize_documents(llm, _docs("beta", "alpha", "alpha")))
+
+    assert stats["cached"] == 2 and stats["map_calls"] == 0
+    assert len(llm.prompts) == calls + 1
+    assert '"S(beta)\n\nS(alpha)"' in llm.prompts[-1]
+
+
+def test_token_counting_runs_off_the_event_loop(monkeypatch):
+    count_tokens = deep_research_service.count_tokens
+    threads = []
+
+    def recording_count_tokens(text, tokenizer=None):
+        threads.append(threading.current_thread())
+        return count_tokens(text, tokenizer)
+
+    monkeypatch.setattr(deep_research_service, "count_tokens", recording_count_tokens)
+    monkeypatch.setattr(deep_research_service, "DEEP_RESEARCH_PACK_TOKENS", 3)
+    asyncio.run(asummarize_documents(EchoSummaryLLM(), _docs("alpha one", "beta two", "gamma three")))
+
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,141 @@
+# backend/tests/test_ingest_service.py
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.services import chunking_service, ingest_service
+from app.services.ingest_service import delete_source, iter_ingest_files, load_manifest
+from app.services.lexical_service import LEXICAL_INDEX_NAME, BM25Index
+from app.services.vector_service import get_lexical_store, get_vector_store, retrieve_documents
+
+
+def _ingest(paths, store_path):
+    async def run():
+        return [result async for result in iter_ingest_files([str(p) for p in paths], store_path=store_path)]
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def sources(tmp_path):
+    fruit = tmp_path / "fruit.txt"
+    fruit.write_text("Apples and pears grow in the orchard.\n\nQuinces ripen late in autumn.", encoding="utf-8")
+    tools = tmp_path / "tools.txt"
+    tools.write_text("A lathe turns wood and metal.\n\nChisels need sharpening.", encoding="utf-8")
+    return fruit, tools
+
+
+def _lexical_sources(index, query):
+    return {doc.metadata["source"] for doc, _ in index.search(query, 10)}
+
+
+def _lexical_ids(store_path):
+    conn = sqlite3.connect(str(Path(store_path) / LEXICAL_INDEX_NAME))
+    try:
+        ids = {row[0] for row in conn.execute("SELECT id FROM docs")}
+        posted = {row[0] for row in conn.execute("SELECT DISTINCT id FROM postings")}
+    finally:
+        conn.close()
+    # No postings are left behind for removed chunks
+    assert posted == ids
+    return ids
+
+
+def test_ingest_indexes_both_stores(store_path, sources):
+    results = _ingest(sources, store_path)
+
+    assert sorted(r["status"] for r in results) == ["added", "added"]
+    ids = {doc_id for entry in load_manifest(store_path).values() for doc_id in entry["ids"]}
+    assert set(get_vector_store(store_path).get()["ids"]) == ids
+    assert _lexical_ids(store_path) == ids
+
+
+def test_delete_source_updates_bm25_index(store_path, sources):
+    _ingest(sources, store_path)
+    # Another worker's handle on the same index, opened before the delete
+    other = BM25Index(Path(store_path) / LEXICAL_INDEX_NAME)
+    assert _lexical_sources(other, "quinces orchard") == {"fruit.txt"}
+
+    removed = delete_source("fruit.txt", store_path)
+
+    assert removed > 0
+    index = get_lexical_store(store_path)
+    assert _lexical_sources(index, "quinces orchard") == set()
+    assert _lexical_sources(index, "lathe chisels") == {"tools.txt"}
+    assert _lexical_ids(store_path) == set(get_vector_store(store_path).get()["ids"])
+    assert _lexical_sources(other, "quinces orchard") == set()
+    assert other.stats() == index.stats()
+    other.close()
+
+    for mode in ("lexical", "hybrid"):
+        hits = retrieve_documents("quinces orchard", k=5, store_path=store_path, mode=mode)
+        assert all(doc.metadata["source"] != "fruit.txt" for doc in hits)
+
+
+def test_delete_unknown_source(store_path):
+    with pytest.raises(KeyError):
+        delete_source("missing.txt", store_path)
+
+
+def test_reingest_drops_stale_chunks(store_path, sources):
+    fruit, _ = sources
+    _ingest([fruit], store_path)
+    fruit.write_text("Quinces ripen late in autumn.", encoding="utf-8")
+
+    assert [r["status"] for r in _ingest([fruit], store_path)] == ["updated"]
+    index = get_lexical_store(store_path)
+    assert _lexical_sources(index, "apples orchard") == set()
+    assert _lexical_ids(store_path) == set(get_vector_store(store_path).get()["ids"])
+
+
+def _csv(path, rows):
+    path.write_text("name,value\n" + "".join(f"{path.stem} row {i},{i}\n" for i in range(rows)), encoding="utf-8")
+    return path
+
+
+def test_failed_write_fails_every_file_in_the_batch(store_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(chunking_service, "CHUNK_SIZE", 8)
+    monkeypatch.setattr(chunking_service, "CHUNK_OVERLAP", 0)
+    write_batch = ingest_service._write_batch
+
+    def single_source_only(batch, abs_path):
+        if len({chunk.metadata["source"] for chunk in batch}) > 1:
+            raise OSError("disk full")
+        return write_batch(batch, abs_path)
+
+    monkeypatch.setattr(ingest_service, "_write_batch", single_source_only)
+    paths = [_csv(tmp_path / "a.csv", 5), _csv(tmp_path / "b.csv", 7)]
+
+    async def run():
+        return [
+            result async for result in
+            iter_ingest_files([str(p) for p in paths], store_path=store_path, batch_size=4)
+        ]
+
+    results = asyncio.run(run())
+
+    # Both files' leftover chunks meet in one batch, so that write fails both
+    assert sorted((r["source"], r["status"]) for r in results) == [("a.csv", "failed"), ("b.csv", "failed")]
+    assert all(r["error"] == "disk full" for r in results)
+    assert load_manifest(store_path) == {}
+
+
+def test_manifest_lists_only_written_chunks(store_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(chunking_service, "CHUNK_SIZE", 8)
+    monkeypatch.setattr(chunking_service, "CHUNK_OVERLAP", 0)
+    paths = [_csv(tmp_path / "a.csv", 5), _csv(tmp_path / "b.csv", 7), tmp_path / "c.txt"]
+    paths[2].write_text("Quinces ripen late in autumn.", encoding="utf-8")
+
+    async def run():
+        return [
+            result async for result in
+            iter_ingest_files([str(p) for p in paths], store_path=store_path, batch_size=4)
+        ]
+
+    results = asyncio.run(run())
+
+    assert sorted(r["status"] for r in results) == ["added"] * 3
+    manifest = load_manifest(store_path)
+    assert sorted(manifest) == ["a.csv", "b.csv", "c.txt"]
+    assert {i for entry in manifest.values() for i in entry["ids"]} == set(get_vector_store(store_path).get()["ids"])
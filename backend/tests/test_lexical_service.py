@@ -0,0 +1,81 @@
+# backend/tests/test_lexical_service.py
+import json
+import sqlite3
+
+from langchain.schema import Document
+
+from app.services import vector_service
+from app.services.lexical_service import LEXICAL_INDEX_NAME, BM25Index, tokenize
+
+
+def _doc(doc_id, text, source="a.txt"):
+    return Document(id=doc_id, page_content=text, metadata={"source": source})
+
+
+def _ids(hits):
+    return [doc.id for doc, _ in hits]
+
+
+def test_tokenize_keeps_compound_words_and_their_parts():
+    assert tokenize("The unit_price of AB-1234") == ["unit_price", "unit", "price", "ab-1234", "ab", "1234"]
+
+
+def test_search_ranks_by_bm25(tmp_path):
+    index = BM25Index(tmp_path / LEXICAL_INDEX_NAME)
+    index.add([
+        _doc("1", "quinces ripen in autumn"),
+        _doc("2", "quinces quinces quinces and pears"),
+        _doc("3", "a lathe turns wood"),
+    ])
+
+    assert _ids(index.search("quinces", 5)) == ["2", "1"]
+    assert index.search("nothing matches", 5) == []
+    assert index.stats()["documents"] == 3
+    hit = index.search("lathe", 1)[0][0]
+    assert (hit.page_content, hit.metadata) == ("a lathe turns wood", {"source": "a.txt"})
+
+
+def test_upsert_and_delete_update_postings(tmp_path):
+    index = BM25Index(tmp_path / LEXICAL_INDEX_NAME)
+    index.add([_doc("1", "quinces ripen in autumn"), _doc("2", "pears ripen in summer")])
+    index.add([_doc("1", "figs ripen in winter")])
+
+    assert index.search("quinces", 5) == []
+    assert _ids(index.search("figs", 5)) == ["1"]
+    index.delete(["2", "missing"])
+    assert index.search("pears", 5) == []
+    assert index.stats() == {"documents": 1, "tokens": 3}
+
+    other = BM25Index(tmp_path / LEXICAL_INDEX_NAME)
+    assert _ids(other.search("figs ripen", 5)) == ["1"]
+
+
+def test_index_written_by_earlier_version_is_rebuilt(tmp_path):
+    path = tmp_path / LEXICAL_INDEX_NAME
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE docs (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+    conn.execute("CREATE TABLE changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL)")
+    conn.execute("INSERT INTO docs VALUES ('1', 'quinces ripen in autumn', ?)", (json.dumps({"source": "a.txt"}),))
+    conn.commit()
+    conn.close()
+
+    index = BM25Index(path)
+    assert _ids(index.search("quinces", 5)) == ["1"]
+    assert index.stats()["documents"] == 1
+
+
+def test_empty_store_is_indexed_once(store_path, monkeypatch):
+    calls = []
+    get_vector_store = vector_service.get_vector_store
+
+    def counting_get_vector_store(*args, **kwargs):
+        store = get_vector_store(*args, **kwargs)
+        get = store.get
+        monkeypatch.setattr(store, "get", lambda **kw: calls.append(kw) or get(**kw))
+        return store
+
+    monkeypatch.setattr(vector_service, "get_vector_store", counting_get_vector_store)
+    for _ in range(3):
+        vector_service.get_lexical_store(store_path)
+
+    assert len(calls) == 1
@@ -0,0 +1,219 @@
+# backend/tests/test_numpy_store.py
+import json
+import multiprocessing
+
+import pytest
+
+from app.services import numpy_store
+from app.services.numpy_store import HEADER_NAME, NumpyVectorStore
+
+from conftest import HashEmbeddings
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "store")
+
+
+def _open(directory):
+    return NumpyVectorStore(persist_directory=directory, embedding_function=HashEmbeddings())
+
+
+def _contents(store):
+    data = store.get()
+    return dict(zip(data["ids"], data["documents"]))
+
+
+def _header(directory):
+    with open(f"{directory}/{HEADER_NAME}", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_add_persist_and_reload(directory):
+    store = _open(directory)
+    store.add_texts(["red apples", "green pears"], metadatas=[{"n": 1}, {"n": 2}], ids=["a", "b"])
+    store.persist()
+
+    reopened = _open(directory)
+    assert _contents(reopened) == {"a": "red apples", "b": "green pears"}
+    assert reopened.get()["metadatas"] == [{"n": 1}, {"n": 2}]
+    assert reopened.similarity_search("green pears", k=1)[0].metadata == {"n": 2}
+
+
+def test_unpersisted_rows_are_searchable_but_not_on_disk(directory):
+    store = _open(directory)
+    store.add_texts(["red apples"], ids=["a"])
+    store.persist()
+    store.add_texts(["green pears"], ids=["b"])
+
+    assert store.similarity_search("green pears", k=1)[0].page_content == "green pears"
+    assert _contents(_open(directory)) == {"a": "red apples"}
+
+
+def test_upsert_replaces_row(directory):
+    store = _open(directory)
+    store.add_texts(["red apples", "green pears"], ids=["a", "b"])
+    store.persist()
+    store.add_texts(["yellow bananas"], ids=["a"])
+    store.persist()
+
+    for handle in (store, _open(directory)):
+        assert _contents(handle) == {"a": "yellow bananas", "b": "green pears"}
+        hits = handle.similarity_search("red apples yellow bananas", k=5)
+        assert [doc.page_content for doc in hits].count("yellow bananas") == 1
+        assert "red apples" not in [doc.page_content for doc in hits]
+
+
+def test_delete_survives_reload(directory):
+    store = _open(directory)
+    store.add_texts(["red apples", "green pears", "blue plums"], ids=["a", "b", "c"])
+    store.persist()
+    store.delete(["b", "missing"])
+    store.persist()
+
+    reopened = _open(directory)
+    assert _contents(reopened) == {"a": "red apples", "c": "blue plums"}
+    assert all(doc.page_content != "green pears" for doc in reopened.similarity_search("green pears", k=3))
+
+
+def test_persist_appends_below_compaction_ratio(directory, monkeypatch):
+    monkeypatch.setattr(numpy_store, "NUMPY_STORE_COMPACT_RATIO", 0.5)
+    store = _open(directory)
+    store.add_texts([f"doc {i}" for i in range(10)], ids=[str(i) for i in range(10)])
+    store.persist()
+    store.delete(["0", "1"])
+    store.persist()
+
+    header = _header(directory)
+    assert (header["rows"], header["dead"], header["generation"]) == (10, 2, 0)
+    assert sorted(_contents(_open(directory))) == [str(i) for i in range(2, 10)]
+
+
+def test_compaction_drops_dead_rows(directory, monkeypatch):
+    monkeypatch.setattr(numpy_store, "NUMPY_STORE_COMPACT_RATIO", 0.5)
+    store = _open(directory)
+    store.add_texts([f"doc {i}" for i in range(10)], ids=[str(i) for i in range(10)])
+    store.persist()
+    store.delete([str(i) for i in range(6)])
+    store.add_texts(["doc 9 again"], ids=["9"])
+    store.persist()
+
+    header = _header(directory)
+    assert (header["rows"], header["dead"], header["generation"]) == (4, 0, 1)
+    expected = {"6": "doc 6", "7": "doc 7", "8": "doc 8", "9": "doc 9 again"}
+    assert _contents(store) == expected
+
+    reopened = _open(directory)
+    assert _contents(reopened) == expected
+    assert reopened.similarity_search("doc 9 again", k=1)[0].page_content == "doc 9 again"
+    # Writes after a compaction append to the compacted files
+    reopened.add_texts(["doc 10"], ids=["10"])
+    reopened.persist()
+    assert _contents(_open(directory)) == {**expected, "10": "doc 10"}
+
+
+def test_delete_collection(directory):
+    store = _open(directory)
+    store.add_texts(["red apples"], ids=["a"])
+    store.persist()
+    store.delete_collection()
+
+    assert _contents(store) == {}
+    assert _contents(_open(directory)) == {}
+
+
+def test_refresh_picks_up_another_handles_writes(directory):
+    writer = _open(directory)
+    writer.add_texts(["red apples", "green pears"], ids=["a", "b"])
+    writer.persist()
+    reader = _open(directory)
+
+    writer.add_texts(["blue plums"], ids=["c"])
+    writer.delete(["a"])
+    writer.persist()
+    reader.refresh()
+
+    assert _contents(reader) == {"b": "green pears", "c": "blue plums"}
+    assert reader.similarity_search("blue plums", k=1)[0].page_content == "blue plums"
+
+
+def test_persist_keeps_rows_another_handle_committed(directory):
+    first = _open(directory)
+    first.add_texts(["red apples", "green pears"], ids=["a", "b"])
+    first.persist()
+    second = _open(directory)
+
+    first.add_texts(["blue plums"], ids=["c"])
+    first.persist()
+    second.add_texts(["black figs", "green pears again"], ids=["d", "b"])
+    second.delete(["a"])
+    second.persist()
+
+    expected = {"b": "green pears again", "c": "blue plums", "d": "black figs"}
+    assert _contents(second) == expected
+    assert _contents(_open(directory)) == expected
+    first.refresh()
+    assert _contents(first) == expected
+
+
+def test_persist_after_another_handle_compacted(directory, monkeypatch):
+    monkeypatch.setattr(numpy_store, "NUMPY_STORE_COMPACT_RATIO", 0.5)
+    first = _open(directory)
+    first.add_texts([f"doc {i}" for i in range(4)], ids=[str(i) for i in range(4)])
+    first.persist()
+    second = _open(directory)
+
+    first.delete(["0", "1", "2"])
+    first.persist()
+    assert _header(directory)["generation"] == 1
+    second.add_texts(["doc 4"], ids=["4"])
+    second.persist()
+
+    assert _contents(_open(directory)) == {"3": "doc 3", "4": "doc 4"}
+
+
+def _write_from_process(directory, worker):
+    store = _open(directory)
+    for n in range(5):
+        store.add_texts([f"worker {worker} doc {n}"], ids=[f"{worker}-{n}"])
+        store.persist()
+
+
+def test_concurrent_writer_processes(directory):
+    _open(directory)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_write_from_process, args=(directory, w)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    assert sorted(_contents(_open(directory))) == sorted(f"{w}-{n}" for w in range(4) for n in range(5))
+
+
+def test_get_filters_by_ids_and_where(directory):
+    store = _open(directory)
+    store.add_texts(
+        ["red apples", "green pears", "blue plums", "black figs"],
+        metadatas=[{"source": "a", "page": 1}, {"source": "a", "page": 2}, {"source": "b", "page": 1}, {}],
+        ids=["a", "b", "c", "d"],
+    )
+    store.delete(["d"])
+
+    assert store.get(ids=["c", "a", "d", "missing"])["ids"] == ["c", "a"]
+    assert store.get(where={"source": "a"})["ids"] == ["a", "b"]
+    assert store.get(where={"page": {"$gt": 1}})["ids"] == ["b"]
+    assert store.get(where={"$or": [{"source": "b"}, {"page": 2}]})["ids"] == ["b", "c"]
+    assert store.get(where={"$and": [{"source": "a"}, {"page": {"$in": [1, 3]}}]})["documents"] == ["red apples"]
+    assert store.get(ids=["a", "c"], where={"source": "b"})["metadatas"] == [{"source": "b", "page": 1}]
+    assert store.get(limit=2, offset=1)["ids"] == ["b", "c"]
+
+
+def test_get_rejects_unsupported_arguments(directory):
+    store = _open(directory)
+    store.add_texts(["red apples"], metadatas=[{"source": "a"}], ids=["a"])
+    with pytest.raises(TypeError):
+        store.get(where_document={"$contains": "apples"})
+    with pytest.raises(ValueError):
+        store.get(where={"source": {"$like": "a%"}})
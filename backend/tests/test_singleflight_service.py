@@ -0,0 +1,213 @@
+# backend/tests/test_singleflight_service.py
+import asyncio
+
+import pytest
+
+from app.services.singleflight_service import SingleFlight
+
+
+def test_do_coalesces_identical_calls():
+    async def run():
+        flights = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"answer": calls}
+
+        results = await asyncio.gather(*(flights.do("q", compute) for _ in range(3)), flights.do("other", compute))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(run())
+    assert calls == 2
+    assert [shared for _, shared in results] == [False, True, True, False]
+    assert results[0][0] == results[1][0] == results[2][0]
+    # Every caller gets its own copy
+    assert results[0][0] is not results[1][0]
+    assert (flights.leaders, flights.coalesced, flights.cancelled) == (2, 2, 0)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_do_runs_again_once_finished():
+    async def run():
+        flights = SingleFlight()
+        first = await flights.do("q", lambda: asyncio.sleep(0, result=1))
+        second = await flights.do("q", lambda: asyncio.sleep(0, result=2))
+        return first, second
+
+    assert asyncio.run(run()) == ((1, False), (2, False))
+
+
+def test_do_shares_failures():
+    async def run():
+        flights = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(flights.do("q", compute), flights.do("q", compute), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_do_survives_one_caller_cancelling():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.ensure_future(flights.do("q", compute))
+        follower = asyncio.ensure_future(flights.do("q", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return flights, await follower, leader
+
+    flights, result, leader = asyncio.run(run())
+    assert result == ("done", True)
+    assert leader.cancelled()
+    assert flights.cancelled == 0
+
+
+def test_do_cancels_work_when_every_caller_is_gone():
+    async def run():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flights.do("q", compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flights
+
+    flights = asyncio.run(run())
+    assert flights.cancelled == 1
+    assert flights.stats()["in_flight"] == 0
+
+
+async def _events(produced, release=None, count=3):
+    for n in range(count):
+        if release is not None and n == 1:
+            await release.wait()
+        produced.append(n)
+        yield {"n": n}
+
+
+def test_stream_subscribers_replay_from_the_start():
+    async def run():
+        flights = SingleFlight()
+        produced = []
+        release = asyncio.Event()
+        done = []
+        leader = flights.start("q", lambda: _events(produced, release), on_done=lambda: done.append(True))
+        first = await leader.__anext__()
+        follower = flights.join("q")
+        release.set()
+        rest = [event async for event in leader]
+        joined = [event async for event in follower]
+        return flights, produced, [first] + rest, joined, done
+
+    flights, produced, leader_events, joined, done = asyncio.run(run())
+    assert produced == [0, 1, 2]
+    assert leader_events == joined == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert done == [True]
+    assert (flights.leaders, flights.coalesced) == (1, 1)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_start_joins_a_stream_already_in_flight():
+    async def run():
+        flights = SingleFlight()
+        produced = []
+        release = asyncio.Event()
+        leader = flights.start("q", lambda: _events(produced, release))
+        await leader.__anext__()
+        done = []
+        second = flights.start("q", lambda: _events(produced), on_done=lambda: done.append(True))
+        release.set()
+        events = [event async for event in second]
+        leader.close()
+        return produced, events, done
+
+    produced, events, done = asyncio.run(run())
+    assert produced == [0, 1, 2]
+    assert events == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert done == [True]
+
+
+def test_stream_continues_after_one_subscriber_detaches():
+    async def run():
+        flights = SingleFlight()
+        produced = []
+        release = asyncio.Event()
+        leader = flights.start("q", lambda: _events(produced, release))
+        await leader.__anext__()
+        follower = flights.join("q")
+        leader.close()
+        release.set()
+        return flights, [event async for event in follower]
+
+    flights, events = asyncio.run(run())
+    assert events == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert flights.cancelled == 0
+
+
+def test_stream_is_cancelled_when_every_subscriber_detaches():
+    async def run():
+        flights = SingleFlight()
+        produced = []
+        done = []
+        leader = flights.start("q", lambda: _events(produced, asyncio.Event()), on_done=lambda: done.append(True))
+        await leader.__anext__()
+        follower = flights.join("q")
+        leader.close()
+        follower.close()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return flights, produced, done
+
+    flights, produced, done = asyncio.run(run())
+    assert produced == [0]
+    assert flights.cancelled == 1
+    assert done == [True]
+    assert flights.join("q") is None
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_stream_failure_reaches_every_subscriber():
+    async def run():
+        flights = SingleFlight()
+
+        async def failing():
+            yield {"n": 0}
+            raise RuntimeError("boom")
+
+        leader = flights.start("q", failing)
+        follower = flights.join("q")
+        outcomes = []
+        for subscription in (leader, follower):
+            events = []
+            with pytest.raises(RuntimeError):
+                async for event in subscription:
+                    events.append(event)
+            outcomes.append(events)
+        return outcomes
+
+    assert asyncio.run(run()) == [[{"n": 0}], [{"n": 0}]]
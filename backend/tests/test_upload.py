@@ -0,0 +1,39 @@
+# backend/tests/test_upload.py
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.api import upload
+
+
+def _post(files, store_path):
+    app = FastAPI()
+    app.include_router(upload.router, prefix="/api")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/upload",
+                files=[("files", (name, content, "text/plain")) for name, content in files],
+                data={"chroma_dir": store_path, "mode": "incremental", "wait": "true"},
+            )
+    return asyncio.run(run())
+
+
+def test_duplicate_file_names_are_rejected(store_path):
+    response = _post([("notes.txt", b"first"), ("dir/notes.txt", b"second"), ("other.txt", b"third")], store_path)
+
+    assert response.status_code == 400
+    assert "notes.txt" in response.json()["error"]
+
+
+def test_upload_indexes_every_file(store_path):
+    response = _post([("notes.txt", b"Quinces ripen late in autumn."), ("other.txt", b"A lathe turns wood.")], store_path)
+
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "completed"
+    assert sorted(job["files"]) == ["notes.txt", "other.txt"]
+    assert all(f["stage"] == "done" and f["chunks"] == 1 for f in job["files"].values())
@@ -3,6 +3,8 @@ import requests
 import uuid
 import os
 import json
+import time
+from urllib.parse import quote
 
 # --- Absolute path to backend vector store ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,6 +12,7 @@ CHROMA_DIR = os.path.abspath(os.path.join(BASE_DIR, "../backend/chroma_store"))
 os.makedirs(CHROMA_DIR, exist_ok=True)
 
 BASE_URL = "http://127.0.0.1:8000/api"
+JOB_POLL_INTERVAL = 0.5  # seconds between ingestion job status checks
 
 st.set_page_config(
     page_title="RAG Chat System",
@@ -29,6 +32,36 @@ if "files_uploaded" not in st.session_state:
     st.session_state.files_uploaded = False
 
 
+def prune_sources(keep: set) -> int:
+    """Remove indexed sources that are no longer in the uploader."""
+    params = {"chroma_dir": CHROMA_DIR}
+    response = requests.get(f"{BASE_URL}/sources", params=params)
+    if response.status_code != 200:
+        return 0
+    removed = 0
+    for entry in response.json().get("sources", []):
+        if entry["source"] not in keep:
+            requests.delete(f"{BASE_URL}/sources/{quote(entry['source'], safe='')}", params=params)
+            removed += 1
+    return removed
+
+
+def wait_for_job(job_id: str) -> dict:
+    """Poll an ingestion job, showing per-file progress, until it finishes."""
+    progress = st.progress(0.0, text="Processing files...")
+    while True:
+        response = requests.get(f"{BASE_URL}/upload/jobs/{job_id}", timeout=10)
+        response.raise_for_status()
+        job = response.json()
+        total = max(job["files_total"], 1)
+        stages = ", ".join(f"{name}: {f['stage']}" for name, f in job["files"].items())
+        progress.progress(min(job["files_done"] / total, 1.0), text=f"{job['chunks_indexed']} chunks indexed — {stages}")
+        if job["status"] in ("completed", "failed"):
+            progress.empty()
+            return job
+        time.sleep(JOB_POLL_INTERVAL)
+
+
 def upload_files():
     st.markdown("<h3 style='color:#1D4ED8; font-weight:700;'>📂 Upload Documents</h3>", unsafe_allow_html=True)
     uploaded_files = st.file_uploader(
@@ -41,27 +74,61 @@ def upload_files():
 
     if uploaded_files:
         files = [("files", (f.name, f, f.type)) for f in uploaded_files]
-        with st.spinner("Uploading and processing files..."):
+        with st.spinner("Uploading files..."):
             try:
+                # Incremental mode: files already indexed with the same content are skipped
                 response = requests.post(
                     f"{BASE_URL}/upload",
                     files=files,
-                    data={"chroma_dir": CHROMA_DIR}
+                    data={"chroma_dir": CHROMA_DIR, "mode": "incremental"}
                 )
-                if response.status_code == 200:
-                    st.success("✅ Files uploaded and indexed successfully!")
-                    st.session_state.files_uploaded = True
-                    st.session_state.chat_history = []
-                else:
-                    st.error(f"Upload failed: {response.text}")
-                    st.session_state.files_uploaded = False
             except Exception as e:
                 st.error(f"Upload error: {e}")
                 st.session_state.files_uploaded = False
+                return
+
+        if response.status_code != 202:
+            st.error(f"Upload failed: {response.text}")
+            st.session_state.files_uploaded = False
+            return
+
+        try:
+            job = wait_for_job(response.json()["job_id"])
+        except Exception as e:
+            st.error(f"Upload error: {e}")
+            st.session_state.files_uploaded = False
+            return
+
+        if job["status"] == "completed":
+            removed = prune_sources({f.name for f in uploaded_files})
+            st.success("✅ Files uploaded and indexed successfully!")
+            st.session_state.files_uploaded = True
+            # Only a changed index invalidates the conversation
+            if job.get("chunks_indexed", 0) > 0 or removed:
+                st.session_state.chat_history = []
+            if job.get("failed"):
+                st.warning("Some files could not be processed: " + "; ".join(job["failed"]))
+        else:
+            st.error("Upload failed: " + ("; ".join(job.get("failed", [])) or job["status"]))
+            st.session_state.files_uploaded = False
     elif not st.session_state.files_uploaded:
         st.info("Please upload at least one document to start chatting.")
 
 
+def iter_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+
 def chat_interface():
     st.markdown("---")
     st.markdown("<h2 style='color:#58A6FF; font-weight:800;'>💬 Chat with Your Documents</h2>", unsafe_allow_html=True)
@@ -104,18 +171,33 @@ def chat_interface():
                             ])
                         }
 
-                        response = requests.get(f"{BASE_URL}/chat", params=params)
-                        if response.status_code == 200:
-                            data = response.json()
-                            answer = data.get("answer", "No answer returned.")
-                            sources = data.get("sources", [])
+                        # Stream tokens into a placeholder as the LLM produces them
+                        placeholder = st.empty()
+                        answer, sources, error = "", [], None
+                        with requests.get(f"{BASE_URL}/chat/stream", params=params, stream=True) as response:
+                            if response.status_code != 200:
+                                error = response.text
+                            else:
+                                for event, data in iter_sse(response):
+                                    if event == "sources":
+                                        sources = data.get("sources", [])
+                                    elif event == "token":
+                                        answer += data.get("token", "")
+                                        placeholder.markdown(f"**A:** {answer}▌")
+                                    elif event == "done":
+                                        answer = data.get("answer", answer)
+                                    elif event == "error":
+                                        error = data.get("detail", "unknown error")
+                        placeholder.empty()
+
+                        if error is None:
                             st.session_state.chat_history.append({
                                 "question": query,
-                                "answer": answer,
+                                "answer": answer or "No answer returned.",
                                 "sources": sources
                             })
                         else:
-                            st.error(f"Server error: {response.text}")
+                            st.error(f"Server error: {error}")
                     except Exception as e:
                         st.error(f"Request error: {e}")
 